@@ -31,7 +31,7 @@ SEED_FILE=./seeds.txt
 #seq 0 9 > $SEED_FILE
 #echo "Generated seed file."
 
-for ALGO in sleepwell;
+for ALGO in sleepwell desync;
 do
     ALGO_DIR=./logs/$ALGO
     mkdir -p $ALGO_DIR
@@ -1,14 +1,22 @@
 #!/usr/bin/python3
 import argparse
-import os
+import os, sys
 import numpy as np
 import networkx as nx
 import multiprocessing as mp
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "graph-simulate"))
+import graphstore
+
 """
 Usage:
     python examine.py --graph-dir DIR --diameter --max-deg --min-deg
     python examine.py --graph-dir DIR --max-deg --median-deg --parallel 4
+
+Graphs are placed in a graphstore.GraphStore, and the workers compute the
+statistics of a graph or of a connected component, given by its nodes, on
+the graph in shared memory.
 """
 def print_parameters(graph_dir):
     param_file = os.path.join(graph_dir, "parameters.txt")
@@ -27,44 +35,48 @@ def load_graph_list(graph_dir):
     return [nx.read_adjlist(f) for f in file_list]
 
 
-def separate_connected_components(graph_list):
-    new_list = []
-    for graph in graph_list:
-        comps = nx.connected_components(graph)
-        new_list += [nx.subgraph(graph, c) for c in comps]
-    return new_list 
+def separate_connected_components(handle_list):
+    return [(handle, nodes) for handle in handle_list
+                for nodes in graphstore.connected_components(
+                                 graphstore.attach(handle))]
+
+
+def connected_count(graph, nodes):
+    return len(graphstore.connected_components(graph))
 
 
-def connected_count(graph):
-    return len(list(nx.connected_components(graph)))
+def size(graph, nodes):
+    return len(nodes)
 
 
-def size(graph):
-    return len(graph)
+def diameter(graph, nodes):
+    return nx.diameter(graph.subgraph(nodes))
 
 
-def diameter(graph):
-    return nx.diameter(graph)
+def max_degree(graph, nodes):
+    return max(graph.degrees()[nodes])
 
 
-def max_degree(graph):
-    return max([tup[1] for tup in graph.degree()])
+def min_degree(graph, nodes):
+    return min(graph.degrees()[nodes])
 
 
-def min_degree(graph):
-    return min([tup[1] for tup in graph.degree()])
+def median_degree(graph, nodes):
+    return np.median(graph.degrees()[nodes])
 
 
-def median_degree(graph):
-    return np.median([tup[1] for tup in graph.degree()])
+def examine_job(job):
+    func, handle, nodes = job
+    return func(graphstore.attach(handle), nodes)
 
 
-def examine_stats(func, graph_list, nproc):
+def examine_stats(func, job_list, nproc):
+    job_list = [(func, handle, nodes) for handle, nodes in job_list]
     if nproc == 1:
-        return [func(graph) for graph in graph_list]
+        return [examine_job(job) for job in job_list]
     
     with mp.Pool(processes=nproc) as pool:
-        return pool.map(func, graph_list)    
+        return pool.map(examine_job, job_list)    
 
 
 def print_stats(name, data):
@@ -104,26 +116,30 @@ if __name__=="__main__":
                      "--connected-count, --connected-size, " +
                      "--max-deg, --min-deg, --median-deg")
 
-    graph_list = load_graph_list(args.graph_dir)
-    subgraph_list = separate_connected_components(graph_list)
+    with graphstore.GraphStore(load_graph_list(args.graph_dir)) as store:
+        graph_list = [(handle, None) for handle in store.handles]
+        subgraph_list = separate_connected_components(store.handles)
     
-    print_parameters(args.graph_dir)
-    if args.diameter:
-        diameters = examine_stats(diameter, subgraph_list, args.parallel)
-        print_stats("Diameter", diameters)
-    if args.connected_count:
-        counts = examine_stats(connected_count, graph_list, args.parallel)
-        print_stats("Connected Count", counts)
-    if args.connected_size:
-        sizes = examine_stats(size, subgraph_list, args.parallel)
-        print_stats("Connected Size", sizes)
-    if args.max_deg:
-        max_degrees = examine_stats(max_degree, subgraph_list, args.parallel)
-        print_stats("Maximum Degree", max_degrees)
-    if args.median_deg:
-        median_degrees = \
-            examine_stats(median_degree, subgraph_list, args.parallel)
-        print_stats("Median Degree", median_degrees)
-    if args.min_deg:
-        min_degrees = examine_stats(min_degree, subgraph_list, args.parallel)
-        print_stats("Minimum Degree", min_degrees)
+        print_parameters(args.graph_dir)
+        if args.diameter:
+            diameters = examine_stats(diameter, subgraph_list, args.parallel)
+            print_stats("Diameter", diameters)
+        if args.connected_count:
+            counts = examine_stats(connected_count, graph_list,
+                                   args.parallel)
+            print_stats("Connected Count", counts)
+        if args.connected_size:
+            sizes = examine_stats(size, subgraph_list, args.parallel)
+            print_stats("Connected Size", sizes)
+        if args.max_deg:
+            max_degrees = \
+                examine_stats(max_degree, subgraph_list, args.parallel)
+            print_stats("Maximum Degree", max_degrees)
+        if args.median_deg:
+            median_degrees = \
+                examine_stats(median_degree, subgraph_list, args.parallel)
+            print_stats("Median Degree", median_degrees)
+        if args.min_deg:
+            min_degrees = \
+                examine_stats(min_degree, subgraph_list, args.parallel)
+            print_stats("Minimum Degree", min_degrees)
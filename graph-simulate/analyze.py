@@ -5,42 +5,82 @@ Usage:
     python analyze.py --logdir DIR --min-broadcast-count --outfile FILE
     python analyze.py --logdir DIR --converge-time --outfile FILE
     python analyze.py --logdir DIR --converge-time --cdf
+    python analyze.py --logdir DIR --converge-time --duration 5000
+    python analyze.py --logdir DIR --converge-time --workers 64
     python analyze.py --logdir DIR --deficit --transient --outfile FILE
     python analyze.py --logdir DIR --deficit --last --outfile FILE
 """
 
 import argparse
+import functools
 import os
-import multiprocessing as mp
 import numpy as np
+import binlog
+import parallel
+from binlog import CODES
 from constants import INTERVAL, SIMULATION_DURATION
 
 
-def process_multiple_logs(logfile_list, func):
-    results = []
-    with mp.Pool(processes=8) as pool:
-        for logfile in logfile_list:
-            results.append(pool.apply_async(func, (logfile,)))
-    
-        return [res.get() for res in results]
+def process_multiple_logs(logfile_list, func, workers=None, chunksize=1):
+    return parallel.run(func, logfile_list, workers, chunksize,
+                        parallel.file_cost)
+
+
+def node_ids(records, kind):
+    return records["node"][records["kind"] == CODES[kind]].tolist()
+
+
+def last_per_node(records, kinds):
+    records = records[np.isin(records["kind"], [CODES[k] for k in kinds])]
+    nodes, index = np.unique(records["node"][::-1], return_index=True)
+    return nodes.tolist(), records[len(records) - 1 - index]
 
 
 def examine_final_offsets(logfile):
+    if binlog.is_binary(logfile):
+        records = binlog.read(logfile)
+        offsets = {node_id: None for node_id in node_ids(records, "init")}
+        nodes, last = last_per_node(records, ["broadcast", "periodic"])
+        offsets.update(zip(nodes, (last["time"] % INTERVAL).tolist()))
+        for record in records[records["kind"] == CODES["offset"]]:
+            offset = binlog.value_or_none(record["value"])
+            offsets[int(record["node"])] = None if offset is None \
+                                               else int(offset)
+        return offsets
+
     offsets = {}
     with open(logfile) as fo:
         for line in fo:
             if "init" in line:
                 node_id = int(line.split(",")[1])
                 offsets[node_id] = None
-            elif "broadcast" in line:
+            elif "broadcast" in line or "periodic" in line:
                 values = line.split(",")
                 timestamp = int(values[0])
                 node_id = int(values[1])
                 offsets[node_id] = timestamp % INTERVAL
+            elif "offset" in line:
+                values = line.rstrip().split(",")
+                node_id = int(values[1])
+                offsets[node_id] = None if values[3] == "None" \
+                                       else int(values[3])
     return offsets
 
 
 def examine_min_broadcast_count(logfile):
+    if binlog.is_binary(logfile):
+        records = binlog.read(logfile)
+        broadcasts = {node_id: 0 for node_id in node_ids(records, "init")}
+        nodes, counts = np.unique(
+                records["node"][records["kind"] == CODES["broadcast"]],
+                return_counts=True)
+        broadcasts.update(zip(nodes.tolist(), counts.tolist()))
+        for record in records[records["kind"] == CODES["periodic"]]:
+            broadcasts[int(record["node"])] += int(record["value"])
+        for record in records[records["kind"] == CODES["count"]]:
+            broadcasts[int(record["node"])] = int(record["value"])
+        return min(broadcasts.values())
+
     broadcasts = {}
     with open(logfile) as fo:
         for line in fo:  
@@ -50,28 +90,46 @@ def examine_min_broadcast_count(logfile):
             elif "broadcast" in line:
                 node_id = int(line.split(",")[1])
                 broadcasts[node_id] += 1
+            elif "periodic" in line:
+                values = line.rstrip().split(",")
+                broadcasts[int(values[1])] += int(values[3].split(":")[2])
+            elif "count" in line:
+                values = line.rstrip().split(",")
+                broadcasts[int(values[1])] = int(values[3])
     return min(broadcasts.values())
 
 
-def examine_converge_time(logfile):
+def examine_converge_time(logfile, duration=SIMULATION_DURATION):
+    if binlog.is_binary(logfile):
+        return converge_time_from_records(binlog.read(logfile), duration)
+
     broadcasts = {}
+    periodic = {}
     with open(logfile) as fo:
         for line in fo:
-            if "init" in line:
+            if "cycle" in line:
+                return float("inf")
+            elif "converge" in line:
+                return float(line.rstrip().split(",")[3])
+            elif "init" in line:
                 node_id = int(line.split(",")[1])
                 broadcasts[node_id] = []
-            elif "broadcast" in line:
+                periodic[node_id] = []
+            elif "broadcast" in line or "periodic" in line:
                 values = line.split(",")
                 timestamp = int(values[0])
                 node_id = int(values[1])
+                if "periodic" in line:
+                    periodic[node_id].append(len(broadcasts[node_id]))
                 broadcasts[node_id].append(timestamp)
     
     max_time = float("-inf")
     for node_id in broadcasts:
-        if broadcasts[node_id][-1] < SIMULATION_DURATION - INTERVAL:
+        if broadcasts[node_id][-1] < duration - INTERVAL:
             return float("inf")
 
         error = np.abs(np.diff(broadcasts[node_id]) - INTERVAL)
+        error[[i - 1 for i in periodic[node_id]]] = 0
         for ind in range(len(error) - 1, -1, -1):
             if error[ind] > 1e-6 * INTERVAL:
                 break
@@ -84,7 +142,44 @@ def examine_converge_time(logfile):
     return max_time
 
 
+def converge_time_from_records(records, duration=SIMULATION_DURATION):
+    kinds = records["kind"]
+    if np.any(kinds == CODES["cycle"]):
+        return float("inf")
+    verdict = records[kinds == CODES["converge"]]
+    if len(verdict) > 0:
+        return float(verdict["value"][0])
+
+    broadcasts = records[np.isin(kinds, [CODES["broadcast"],
+                                         CODES["periodic"]])]
+    order = np.argsort(broadcasts["node"], kind="stable")
+    nodes = broadcasts["node"][order]
+    times = broadcasts["time"][order]
+    runs = broadcasts["kind"][order] == CODES["periodic"]
+    starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+    ends = np.r_[starts[1:], len(nodes)]
+    if len(starts) < len(node_ids(records, "init")) or \
+            np.any(ends - starts < 2):
+        return float("inf")
+    if np.any(times[ends - 1] < duration - INTERVAL):
+        return float("inf")
+
+    bad = np.abs(np.diff(times) - INTERVAL) > 1e-6 * INTERVAL
+    bad &= (nodes[1:] == nodes[:-1]) & ~runs[1:]
+    if np.any(bad[ends - 2]):
+        return float("inf")
+    after_bad = np.where(np.r_[False, bad], np.arange(len(times)), -1)
+    latest_bad = np.maximum.reduceat(after_bad, starts)
+    converge = np.where(latest_bad >= 0, latest_bad, starts + 1)
+    return int(times[converge].max())
+
+
 def examine_last_deficit(logfile):
+    if binlog.is_binary(logfile):
+        records = binlog.read(logfile)
+        _, last = last_per_node(records, ["deficit", "last-deficit"])
+        return float(last["value"].max())
+
     deficits = {}
     with open(logfile) as fo:
         for line in fo:
@@ -135,14 +230,24 @@ if __name__ == "__main__":
     stat_group.add_argument("--deficit", action="store_true",
                             help="Flag to collect deficits")
     
+    parser.add_argument("--duration", type=int,
+                        default=SIMULATION_DURATION // INTERVAL,
+                        help="simulated time of the logs in intervals " +
+                             "(default: %d)" %
+                             (SIMULATION_DURATION // INTERVAL))
     parser.add_argument("--transient", action="store_true",
                         help="Collect deficits only in transient phase")
     parser.add_argument("--last", action="store_true",
                         help="Collect maximum among deficits " +
                              "last reported by each node.")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=1,
+                        help="logs sent to a worker at a time (default: 1)")
     
     args = parser.parse_args()
     args.logdir = os.path.normpath(args.logdir)
+    duration = args.duration * INTERVAL
 
     if args.converge_time is None and args.cdf is not None:
         parser.error("--cdf is only used with --converge-time.")
@@ -150,6 +255,9 @@ if __name__ == "__main__":
         parser.error("--transient is only used with --deficit.")
     if not os.path.isdir(args.logdir):
         parser.error("%s does not exist." % args.logdir)
+    if (args.workers is not None and args.workers <= 0) or \
+            args.chunksize <= 0:
+        parser.error("--workers and --chunksize should be positive.")
 
     if args.deficit is not None and \
             (args.transient is None and args.last is None):
@@ -162,17 +270,21 @@ if __name__ == "__main__":
 
     if args.converge_time:
         #data = [examine_converge_time(f) for f in filepath_list]
-        data = process_multiple_logs(filepath_list, examine_converge_time)
+        data = process_multiple_logs(
+                filepath_list,
+                functools.partial(examine_converge_time, duration=duration),
+                args.workers, args.chunksize)
         print(max(data))
 
     if args.deficit and args.transient:
         data = [examine_transient_deficit(f) for f in filepath_list]
 
     if args.deficit and args.last:
-        data = process_multiple_logs(filepath_list, examine_last_deficit)
+        data = process_multiple_logs(filepath_list, examine_last_deficit,
+                                     args.workers, args.chunksize)
     
     if args.cdf:
-        bins, cdfs = calculate_cdf(data, 0, SIMULATION_DURATION, 20)
+        bins, cdfs = calculate_cdf(data, 0, duration, 20)
         output_str = "\n".join("%f\t%f" % (b, c) for (b, c) in zip(bins, cdfs))
     else:
         output_str = "\n".join("%s\t%s" % (f, str(d))
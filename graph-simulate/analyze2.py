@@ -2,27 +2,57 @@
 
 import numpy as np
 import networkx as nx
+import graph as graphutils
+import analyze
+import binlog
 from constants import INTERVAL
 
 
 def examine_final_offsets(logfile):
+    if binlog.is_binary(logfile):
+        return analyze.examine_final_offsets(logfile)
+
     offsets = {}
     with open(logfile) as fo:
         for line in fo:
             if "init" in line:
                 node_id = int(line.split(",")[1])
                 offsets[node_id] = None
-            elif "broadcast" in line:
+            elif "broadcast" in line or "periodic" in line:
                 values = line.split(",")
                 timestamp = int(values[0])
                 node_id = int(values[1])
                 offsets[node_id] = timestamp % INTERVAL
+            elif "offset" in line:
+                values = line.rstrip().split(",")
+                node_id = int(values[1])
+                offsets[node_id] = None if values[3] == "None" \
+                                       else int(values[3])
     return offsets
 
 
+def read_target_separation(logfile):
+    if binlog.is_binary(logfile):
+        records = binlog.read(logfile)
+        records = records[records["kind"] == binlog.CODES["separation"]]
+        if len(records) == 0:
+            return None
+        return binlog.value_or_none(float(records["value"][0]))
+
+    with open(logfile) as fo:
+        for line in fo:
+            if "separation" in line:
+                value = line.rstrip().split(",")[3]
+                return None if value == "None" else float(value)
+    return None
+
+
 def examine_target_separation(graphfile, logfile):
     graph = nx.read_adjlist(graphfile)
-    graph = nx.convert_node_labels_to_integers(graph, ordering="sorted")
+    graph = graphutils.convert_nodes_to_integers(graph)
+    separation = read_target_separation(logfile)
+    if separation is not None:
+        return separation
     offsets = examine_final_offsets(logfile) 
 
     surplus = []
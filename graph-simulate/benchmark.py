@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+
+"""
+Usage:
+    python benchmark.py --scheduler
+    python benchmark.py --scheduler --algo solo2 --alpha 50 --repeat 5
+    python benchmark.py --fanout
+    python benchmark.py --queue-stats --algo desync
+    python benchmark.py --engine --algo solo2 --alpha 87 --batch 1000
+    python benchmark.py --pdes --nodes 100000 --max-partitions 64
+"""
+
+import argparse
+import math
+import time
+import networkx as nx
+import main as simulate
+import lockstep
+import parallel
+import pdes
+import pqueue as pq
+import graph as graphutils
+from constants import INTERVAL
+
+PDES_DEGREE = 10
+
+
+def complete_workload():
+    return [nx.complete_graph(n) for n in range(2, 33)]
+
+
+def udg_workload():
+    graph = nx.random_geometric_graph(1000, 0.04, seed=0)
+    return [graphutils.convert_nodes_to_integers(graph)]
+
+
+def binomial_workload():
+    return [nx.gnp_random_graph(100, 0.5, seed=0)]
+
+
+WORKLOADS = {"complete-32": complete_workload, "udg-1000": udg_workload,
+             "binomial-100": binomial_workload}
+
+
+def measure(graph_list, seed, algorithm, options):
+    num_events = 0
+    start = time.perf_counter()
+    for graph in graph_list:
+        result = simulate.simulate(graph, seed, algorithm, options)
+        num_events += result["events"]
+    elapsed = time.perf_counter() - start
+    return num_events, elapsed
+
+
+def benchmark_variants(algorithm, repeat, variants, count_events=True):
+    """ benchmark_variants runs every workload repeat times with the
+        options of each variant. Variants that deliver broadcasts as
+        different numbers of events are compared with count_events False,
+        by instances/sec instead of events/sec.
+    """
+    if count_events:
+        print("workload\tvariant\tevents\tseconds\tevents/sec")
+        row = "%s\t%s\t%d\t%.3f\t%.0f"
+    else:
+        print("workload\tvariant\tinstances\tseconds\tinstances/sec")
+        row = "%s\t%s\t%d\t%.3f\t%.2f"
+    for name in sorted(WORKLOADS):
+        graph_list = WORKLOADS[name]()
+        for label, options in variants:
+            runs = [measure(graph_list, seed, algorithm, options)
+                        for seed in range(repeat)]
+            count = sum(r[0] for r in runs)
+            if not count_events:
+                count = repeat * len(graph_list)
+            elapsed = sum(r[1] for r in runs)
+            print(row % (name, label, count, elapsed, count / elapsed))
+
+
+def benchmark_schedulers(algorithm, repeat):
+    variants = [(scheduler, simulate.make_options(scheduler=scheduler))
+                    for scheduler in sorted(pq.SCHEDULERS)]
+    benchmark_variants(algorithm, repeat, variants)
+
+
+def report_queue_stats(algorithm, repeat):
+    print("workload\tcompact_ratio\tpeak\tcompactions\tseconds")
+    for name in sorted(WORKLOADS):
+        graph_list = WORKLOADS[name]()
+        for ratio in [1.0, 0.5, 0.1]:
+            options = simulate.make_options(compact_ratio=ratio)
+            peak = 0
+            compactions = 0
+            start = time.perf_counter()
+            for seed in range(repeat):
+                for graph in graph_list:
+                    stats = simulate.simulate(graph, seed, algorithm,
+                                              options)["queue"]
+                    peak = max(peak, stats["peak"])
+                    compactions += stats["compactions"]
+            elapsed = time.perf_counter() - start
+            print("%s\t%.1f\t%d\t%d\t%.3f" % (name, ratio, peak, compactions,
+                                              elapsed))
+
+
+def benchmark_engines(algorithm, num_seeds):
+    print("graph\tengine\tinstances\tseconds\tinstances/sec")
+    seed_list = list(range(num_seeds))
+    for n in [4, 8, 16, 32]:
+        graph = nx.complete_graph(n)
+        start = time.perf_counter()
+        for seed in seed_list[:max(num_seeds // 20, 1)]:
+            simulate.simulate(graph, seed, algorithm)
+        elapsed = time.perf_counter() - start
+        count = max(num_seeds // 20, 1)
+        print("complete-%d\tevent\t%d\t%.3f\t%.1f" % (n, count, elapsed,
+                                                     count / elapsed))
+
+        start = time.perf_counter()
+        lockstep.simulate(graph, seed_list, algorithm)
+        elapsed = time.perf_counter() - start
+        print("complete-%d\tnumpy\t%d\t%.3f\t%.1f" % (n, num_seeds, elapsed,
+                                                     num_seeds / elapsed))
+
+
+def udg(num_nodes, degree, seed):
+    radius = math.sqrt(degree / (math.pi * num_nodes))
+    graph = nx.random_geometric_graph(num_nodes, radius, seed=seed)
+    return graphutils.convert_nodes_to_integers(graph)
+
+
+def benchmark_pdes(num_nodes, max_partitions, intervals):
+    """ benchmark_pdes reports events/sec of SleepWell on a UDG of
+        num_nodes nodes with an average degree of PDES_DEGREE, run by the
+        event simulator and by pdes with 1, 2, 4, ... max_partitions parts.
+    """
+    algorithm = {"type": "sleepwell"}
+    options = simulate.make_options(duration=intervals * INTERVAL)
+    simulate.configure(algorithm, options)
+    graph = udg(num_nodes, PDES_DEGREE, 0)
+    print("nodes\tpartitions\tevents\tseconds\tevents/sec")
+
+    start = time.perf_counter()
+    num_events = simulate.simulate(graph, 0, algorithm, options)["events"]
+    elapsed = time.perf_counter() - start
+    print("%d\tsequential\t%d\t%.3f\t%.0f" % (num_nodes, num_events,
+                                               elapsed,
+                                               num_events / elapsed))
+
+    num_parts = 1
+    while num_parts <= max_partitions:
+        start = time.perf_counter()
+        results = pdes.simulate(graph, 0, options, num_parts)
+        num_events = simulate.merge_held(results, options)["events"]
+        elapsed = time.perf_counter() - start
+        print("%d\t%d\t%d\t%.3f\t%.0f" % (num_nodes, num_parts, num_events,
+                                          elapsed, num_events / elapsed))
+        num_parts *= 2
+
+
+def benchmark_fanout(algorithm, repeat):
+    variants = [("per-neighbor", simulate.make_options(fanout=False)),
+                ("fanout", simulate.make_options(fanout=True))]
+    # A fanout broadcast is one event for all its receptions.
+    benchmark_variants(algorithm, repeat, variants, count_events=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                description="Benchmark the simulator.")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="Flag to compare event queue implementations")
+    parser.add_argument("--fanout", action="store_true",
+                        help="Flag to compare per-neighbor and fan-out " +
+                             "broadcast delivery")
+    parser.add_argument("--queue-stats", action="store_true",
+                        help="Flag to report queue size with and without " +
+                             "compaction of dead entries")
+    parser.add_argument("--engine", action="store_true",
+                        help="Flag to compare instances/sec of the event " +
+                             "simulator and the lockstep engine")
+    parser.add_argument("--pdes", action="store_true",
+                        help="Flag to report events/sec of SleepWell on " +
+                             "a UDG against the number of partitions")
+    parser.add_argument("--nodes", type=int, default=10000,
+                        help="Number of UDG nodes with --pdes " +
+                             "(default: 10000)")
+    parser.add_argument("--max-partitions", type=int,
+                        default=parallel.cpu_workers(),
+                        help="Largest number of partitions with --pdes " +
+                             "(default: CPU count)")
+    parser.add_argument("--intervals", type=int, default=10,
+                        help="Simulated intervals with --pdes " +
+                             "(default: 10)")
+    parser.add_argument("--algo", default="sleepwell",
+                        choices=["sleepwell", "solo", "solo2", "desync"],
+                        help="string indicating the algorithm")
+    parser.add_argument("--alpha", type=int, default=50,
+                        help="alpha parameter for solo, solo2, desync")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of seeds per workload (default: 3)")
+    parser.add_argument("--batch", type=int, default=1000,
+                        help="Number of seeds per lockstep batch " +
+                             "(default: 1000)")
+
+    args = parser.parse_args()
+    if not any([args.scheduler, args.fanout, args.queue_stats,
+                args.engine, args.pdes]):
+        parser.error("Require at least one from --scheduler, --fanout, " +
+                     "--queue-stats, --engine, --pdes")
+    if args.engine and args.algo not in lockstep.ENGINES:
+        parser.error("--engine supports --algo %s." %
+                     ", ".join(sorted(lockstep.ENGINES)))
+
+    algo = {"type": args.algo, "alpha": args.alpha}
+    if args.scheduler:
+        benchmark_schedulers(algo, args.repeat)
+    if args.fanout:
+        benchmark_fanout(algo, args.repeat)
+    if args.queue_stats:
+        report_queue_stats(algo, args.repeat)
+    if args.engine:
+        benchmark_engines(algo, args.batch)
+    if args.pdes:
+        benchmark_pdes(args.nodes, args.max_partitions, args.intervals)
@@ -0,0 +1,58 @@
+import numpy as np
+
+MAGIC = b"GGLOG\x00\x01\x00"
+RECORD = np.dtype([("time", "<i8"), ("node", "<i4"), ("kind", "u1"),
+                   ("value", "<f8")])
+KINDS = ["init", "broadcast", "deficit", "reset", "adjust", "converge",
+         "cycle", "offset", "count", "last-deficit", "separation",
+         "periodic"]
+CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+"""
+A binary log is MAGIC followed by fixed-width records of RECORD, in the
+order of the text log. The kind of a record is its index in KINDS, and a
+value of None is stored as NaN. A periodic record keeps only the count of
+its run as the value.
+"""
+
+
+def to_float(value):
+    if value is None or value == "None":
+        return np.nan
+    return float(value)
+
+
+def write_records(log, fo):
+    records = np.empty(len(log), dtype=RECORD)
+    if log:
+        times, nodes, kinds, values = zip(*log)
+        records["time"] = times
+        records["node"] = nodes
+        records["kind"] = [CODES[k] for k in kinds]
+        records["value"] = [to_float(v.rsplit(":", 1)[1]) if k == "periodic"
+                                else to_float(v)
+                            for k, v in zip(kinds, values)]
+    records.tofile(fo)
+
+
+def write(log, output_file):
+    with open(output_file, "wb") as fo:
+        fo.write(MAGIC)
+        write_records(sorted(log), fo)
+
+
+def is_binary(logfile):
+    with open(logfile, "rb") as fo:
+        return fo.read(len(MAGIC)) == MAGIC
+
+
+def read(logfile):
+    with open(logfile, "rb") as fo:
+        fo.seek(0, 2)
+        if fo.tell() == len(MAGIC):
+            return np.empty(0, dtype=RECORD)
+    return np.memmap(logfile, dtype=RECORD, mode="r", offset=len(MAGIC))
+
+
+def value_or_none(value):
+    return None if np.isnan(value) else value
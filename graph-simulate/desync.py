@@ -1,10 +1,16 @@
 import random
+from node import Node
+from streams import LegacyStream
 from constants import INTERVAL
 
+CONFIG_FANOUT = False
+LOG_EVENTS = ["init", "broadcast", "deficit", "adjust"]
+CONFIG_LOG_EVENTS = frozenset(LOG_EVENTS)
+
 JITTER = 10
 ALPHA = 50
 
-class DesyncNode(object):
+class DesyncNode(Node):
     """ DESYNC Node behaves in the following manner.
     1. When it starts, it broadcasts a beacon and reschedules a broadcast for
        INTERVAL after.
@@ -19,27 +25,20 @@ class DesyncNode(object):
        its predecessor and its successor. It delays the next broacast based on
        this adjustment. Lastly, the fired variable is set to false.
     """
+    __slots__ = ("fired", "prev", "next_broadcast")
+
     def __init__(self, node_id, pq):
-        self.node_id = node_id
-        self.pq = pq
-        self.neighbor_map = {}
-        self.links = set([])
+        super().__init__(node_id, pq)
+        self.stream = LegacyStream(random, JITTER)
 
         # State
-        self.on = False
         self.fired = False
         self.prev = None
-        self.time_task = None
-        self.latest_broadcast = None
         self.next_broadcast = None
 
         # Logging related
-        self.log = []
-        self.log.append((0, self.node_id, "init", "None"))
-
-
-    def set_links(self, node_list):
-        self.links = set(node_list)
+        if "init" in CONFIG_LOG_EVENTS:
+            self.log.append((0, self.node_id, "init", "None"))
 
 
     def start(self, aux):
@@ -49,45 +48,47 @@ class DesyncNode(object):
         self.next_broadcast = self.now() + INTERVAL
 
 
-    def now(self):
-        return self.pq.current
-
-
     def close_slot(self):
         now = self.now()
         target_share = self.target_share()
         my_share = now - self.latest_broadcast
         deficit = (target_share - my_share) / target_share
-        self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if "deficit" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if self.observer is not None:
+            self.observer.deficit(self.node_id, now, deficit)
         self.fired = False
 
 
     def broadcast(self):
         now = self.now() 
-        for neighbor in self.links:
-            task = (neighbor.recv_callback, (self.node_id,))
-            self.pq.add_task(task, now)
+        self.send((self.node_id,), CONFIG_FANOUT)
         
-        self.log.append((now, self.node_id, "broadcast", "None"))
+        if "broadcast" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "broadcast", "None"))
+        if self.observer is not None:
+            self.observer.broadcast(self.node_id, now)
         if self.fired:
             self.close_slot()
         self.fired = True
         self.latest_broadcast = now
 
 
-    def recv_callback(self, src):
+    def recv_callback(self, slot, src):
         if not self.on:
             return
         
         now = self.now()
-        self.neighbor_map[src] = now % INTERVAL
+        self.neighbor_map[slot] = now % INTERVAL
 
         if self.fired:
             self.close_slot()
             _next = now - self.latest_broadcast
             _prev = INTERVAL - _next if self.prev is None else self.prev
             adjustment = ALPHA * (_next - _prev) // 200
-            self.log.append((now, self.node_id, "adjust", adjustment/INTERVAL))
+            if "adjust" in CONFIG_LOG_EVENTS:
+                self.log.append((now, self.node_id, "adjust",
+                                 adjustment/INTERVAL))
             self.set_timer(self.next_broadcast + adjustment - now) 
         else:
             my_offset = self.next_broadcast % INTERVAL
@@ -103,9 +104,12 @@ class DesyncNode(object):
    
 
     def set_timer(self, interval):
-        self.timer_task = (self.timer_callback, (None,))
-        interval += random.randint(-JITTER, JITTER)
-        self.pq.add_task(self.timer_task, self.now() + interval)
+        interval += self.stream.jitter()
+        if self.timer is None:
+            self.timer = self.pq.schedule(self.timer_callback, (None,),
+                                          self.now() + interval)
+        else:
+            self.pq.reschedule(self.timer, self.now() + interval)
 
 
     def target_share(self):
@@ -3,13 +3,13 @@
 import numpy as np
 import networkx as nx
 import main as simulate
-import analyze
 import random
 import collections
-import multiprocessing as mp
 import itertools
 import os
 import graph as graphutils
+import graphstore
+import parallel
 from constants import INTERVAL, SIMULATION_DURATION
 
 NUM_NODES=20
@@ -156,9 +156,20 @@ def make_graph(topo_seed):
     save_positions(graph, coord_file)
 
 
-def make_graphs_in_parallel(topo_seeds, nproc=8):
-    with mp.Pool(nproc) as pool:
-        graph_list = pool.map(make_graph, topo_seeds)
+def make_graphs_in_parallel(topo_seeds, workers=None):
+    parallel.run(make_graph, topo_seeds, workers)
+
+
+def make_graph_store(topo_seeds):
+    """ make_graph_store places the graphs of topo_seeds, with their
+        coordinates, in a graphstore.GraphStore for the workers of the
+        offset and event detection steps.
+    """
+    graphs = [graphutils.read_graph(graph_filename_from_seed(ts))
+                 for ts in topo_seeds]
+    coords = [read_coordinates(coord_filename_from_seed(ts))
+                 for ts in topo_seeds]
+    return graphstore.GraphStore(graphs, coords)
 
 
 """ Offset generation related functions.
@@ -166,28 +177,28 @@ def make_graphs_in_parallel(topo_seeds, nproc=8):
 def assign_offsets(args):
     topo_seed = args[0]
     offset_seed = args[1]
+    handle = args[2]
 
     graph_file = graph_filename_from_seed(topo_seed)
-    log_file = log_filename_from_seed(topo_seed, offset_seed)
     offset_file = offset_filename_from_seed(topo_seed, offset_seed)
 
     if os.path.exists(offset_file):
         return
     
     if algo["description"] == "random":
+        # Offsets are drawn in the order of the nodes in the graph file.
         random.seed(offset_seed)
         graph = nx.read_adjlist(graph_file)
         graph = graphutils.convert_nodes_to_integers(graph)
         offset_dict = {n: random.randint(0, INTERVAL - 1) for n in graph}
     elif algo["description"] == "sync":
-        graph = nx.read_adjlist(graph_file)
-        graph = graphutils.convert_nodes_to_integers(graph)
+        graph = graphstore.attach(handle)
         offset_dict = {n: 0 for n in graph}
 
     else:
-        simulate.test_instance(graph_file, offset_seed, algo, log_file)
-        max_time = analyze.examine_converge_time(log_file)
-        offset_dict = analyze.examine_final_offsets(log_file)
+        summary = simulate.summarize(handle, offset_seed, algo)
+        max_time = summary["converge"]
+        offset_dict = summary["offset"]
         if max_time > 80 * INTERVAL:
             for node_id in offset_dict:
                 offset_dict[node_id] = -1
@@ -197,10 +208,16 @@ def assign_offsets(args):
             fo.write(str(node_id) + "," + str(offset_dict[node_id]) + "\n")
 
 
-def assign_offsets_in_parallel(topo_seeds, offset_seeds, nproc=8):
-    args_list = [(ts, os) for ts in topo_seeds for os in offset_seeds]
-    with mp.Pool(nproc) as pool:
-        pool.map(assign_offsets, args_list)
+def assign_offsets_cost(args):
+    return args[2].cost()
+
+
+def assign_offsets_in_parallel(handles, topo_seeds, offset_seeds,
+                               workers=None):
+    args_list = [(ts, os, handles[ts]) for ts in topo_seeds
+                    for os in offset_seeds]
+    parallel.run(assign_offsets, args_list, workers,
+                 cost=assign_offsets_cost)
 
 
 """ Event detection related functions.
@@ -265,9 +282,9 @@ def detect_events(args):
     topo_seed = args[0]
     offset_seed = args[1]
     event_seed = args[2]
+    handle = args[3]
 
     offset_file = offset_filename_from_seed(topo_seed, offset_seed)
-    coord_file = coord_filename_from_seed(topo_seed)
     detectable_file = detectable_filename_from_seed(topo_seed, offset_seed,
                                                     event_seed)
 
@@ -277,7 +294,7 @@ def detect_events(args):
     dnode_offsets = {}
     offsets = read_offsets(offset_file)
     if offsets[0] != -1:
-        coordinates = read_coordinates(coord_file)
+        coordinates = graphstore.attach(handle).coords
         bbox = bounding_box_from_coordinates(coordinates)
         event_point = drop_event_location(bbox, event_seed)
         dnode_offsets = detectable_offsets(coordinates, offsets, event_point)
@@ -292,11 +309,11 @@ def detect_events(args):
         fo.write("".join(["%d,%d\n" % (k, v) for k, v in dnode_offsets]))
 
 
-def detect_events_in_parallel(topo_seeds, offset_seeds, event_seeds,
-                              nproc=8):
-    args_list = list(itertools.product(topo_seeds, offset_seeds, event_seeds))
-    with mp.Pool(nproc) as pool:
-        pool.map(detect_events, args_list)
+def detect_events_in_parallel(handles, topo_seeds, offset_seeds, event_seeds,
+                              workers=None):
+    args_list = [(*seeds, handles[seeds[0]]) for seeds in
+                    itertools.product(topo_seeds, offset_seeds, event_seeds)]
+    parallel.run(detect_events, args_list, workers)
 
 
 def worst_latency(args):
@@ -329,14 +346,13 @@ def worst_latency(args):
 
 
 def worst_latency_in_parallel(topo_seeds, offset_seeds, event_seeds,
-                              nproc=8):
+                              workers=None):
     latency_filename = worst_latency_filename(algo["description"])
     if os.path.exists(latency_filename):
         return
 
     args_list = list(itertools.product(topo_seeds, offset_seeds, event_seeds))
-    with mp.Pool(nproc) as pool:
-        latency = pool.map(worst_latency, args_list)
+    latency = parallel.run(worst_latency, args_list, workers)
 
     string = ""
     for seed_tup, l in zip(args_list, latency):
@@ -400,7 +416,7 @@ def display_event(topo_seed, event_seed):
 
 """ Main function.
 """
-def main(algorithm):
+def main(algorithm, workers=None):
     import time
     
     global algo 
@@ -411,22 +427,27 @@ def main(algorithm):
     construct_directories(topo_seeds, offset_seeds)
 
     start = time.time()
-    make_graphs_in_parallel(topo_seeds, nproc=8)
+    make_graphs_in_parallel(topo_seeds, workers)
     end = time.time()
     print("Made graphs.", end - start)
 
-    start = time.time()
-    assign_offsets_in_parallel(topo_seeds, offset_seeds, nproc=8)
-    end = time.time()
-    print("Assigned offsets.", end - start)
+    with make_graph_store(topo_seeds) as store:
+        handles = dict(zip(topo_seeds, store.handles))
 
-    start = time.time()
-    detect_events_in_parallel(topo_seeds, offset_seeds, event_seeds, 8)
-    end = time.time()
-    print("Identified detectable nodes", end - start)
+        start = time.time()
+        assign_offsets_in_parallel(handles, topo_seeds, offset_seeds,
+                                   workers)
+        end = time.time()
+        print("Assigned offsets.", end - start)
+
+        start = time.time()
+        detect_events_in_parallel(handles, topo_seeds, offset_seeds,
+                                  event_seeds, workers)
+        end = time.time()
+        print("Identified detectable nodes", end - start)
 
     start = time.time()
-    worst_latency_in_parallel(topo_seeds, offset_seeds, event_seeds, 8)
+    worst_latency_in_parallel(topo_seeds, offset_seeds, event_seeds, workers)
     end = time.time()
     print("Calculated worst-case latencies.", end - start)
 
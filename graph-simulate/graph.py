@@ -1,7 +1,35 @@
+import functools
 import networkx as nx
+import graphstore
+
+GRAPH_CACHE_SIZE = 8
 
 
 def convert_nodes_to_integers(graph):
     mapping = {i: int(i) for i in graph}
     return nx.relabel_nodes(graph, mapping)
 
+
+def read_graph(graph_file):
+    """ read_graph reads an adjacency list with integer node labels. """
+    graph = nx.read_adjlist(graph_file)
+    return convert_nodes_to_integers(graph)
+
+
+@functools.lru_cache(maxsize=GRAPH_CACHE_SIZE)
+def load_graph(graph_file):
+    """ load_graph is read_graph with graphs cached per process, so a worker
+        running many seeds of a graph parses it once. The returned graph is
+        shared and must not be modified.
+    """
+    return read_graph(graph_file)
+
+
+def open_graph(source):
+    """ open_graph returns the graph of source, which is either the path of
+        an adjacency list, read by load_graph, or a graphstore.GraphHandle,
+        attached in place.
+    """
+    if isinstance(source, graphstore.GraphHandle):
+        return graphstore.attach(source)
+    return load_graph(source)
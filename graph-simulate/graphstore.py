@@ -0,0 +1,238 @@
+import networkx as nx
+import numpy as np
+from multiprocessing import shared_memory
+
+INDEX_DTYPE = np.int64
+COORD_DTYPE = np.float64
+
+"""
+The graph store keeps the graphs of a sweep in compressed sparse row (CSR)
+form in a single block of shared memory, so that pool workers read them in
+place instead of parsing graph files or unpickling NetworkX graphs.
+
+A graph of n nodes is stored as indptr, n + 1 offsets into indices, which
+lists the neighbors of node 0, then of node 1, and so on, each in the order
+of graph.neighbors, followed by the coordinates of the nodes as an n x 2
+array if the graph has them. Node k of a stored graph is the k-th node of
+sorted(graph), which is node k itself for the simulator graphs labeled
+0, ..., n - 1.
+
+The process running a sweep creates a GraphStore and hands the GraphHandle
+of each graph to the workers, which attach it. Workers forked after the
+store was made share its mapping, and others map the block by name, so the
+graphs take the same memory however many workers read them.
+"""
+
+
+class CSRGraph(object):
+    """ CSRGraph is a read-only graph over CSR arrays, which may be views of
+        shared memory.
+        1. It reads as the NetworkX graphs the simulator uses: len is the
+           number of nodes, iterating yields 0, ..., n - 1, and neighbors(i)
+           returns a list of ints.
+        2. coords is an n x 2 array of coordinates, or None.
+    """
+    __slots__ = ("indptr", "indices", "coords")
+
+    def __init__(self, indptr, indices, coords=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.coords = coords
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]].tolist()
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def subgraph(self, nodes):
+        """ subgraph returns the subgraph induced by nodes as a NetworkX
+            graph, with the node ids of this graph.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from((i, j) for i in nodes
+                                 for j in self.neighbors(i) if j in graph)
+        return graph
+
+    def to_networkx(self):
+        return self.subgraph(range(len(self)))
+
+
+class GraphHandle(object):
+    """ GraphHandle locates a graph in the block of a GraphStore. It is
+        small and cheap to send to a worker in place of the graph.
+    """
+    __slots__ = ("name", "offset", "num_nodes", "num_entries", "has_coords")
+
+    def __init__(self, name, offset, num_nodes, num_entries, has_coords):
+        self.name = name
+        self.offset = offset
+        self.num_nodes = num_nodes
+        self.num_entries = num_entries
+        self.has_coords = has_coords
+
+    def key(self):
+        return self.name, self.offset
+
+    def cost(self):
+        return self.num_nodes + self.num_entries
+
+
+def nbytes(num_nodes, num_entries, has_coords):
+    size = (num_nodes + 1 + num_entries) * np.dtype(INDEX_DTYPE).itemsize
+    if has_coords:
+        size += 2 * num_nodes * np.dtype(COORD_DTYPE).itemsize
+    return size
+
+
+def from_networkx(graph, coords=None):
+    """ from_networkx returns graph as a CSRGraph in local memory. coords
+        lists the coordinates of the nodes in the order of sorted(graph).
+    """
+    nodes = sorted(graph)
+    index = {node: k for k, node in enumerate(nodes)}
+    indptr = np.zeros(len(nodes) + 1, dtype=INDEX_DTYPE)
+    indptr[1:] = np.cumsum([len(graph[node]) for node in nodes])
+    indices = np.fromiter((index[j] for node in nodes
+                              for j in graph.neighbors(node)),
+                          dtype=INDEX_DTYPE, count=indptr[-1])
+    if coords is not None:
+        coords = np.asarray(coords, dtype=COORD_DTYPE).reshape(-1, 2)
+    return CSRGraph(indptr, indices, coords)
+
+
+def as_csr(graph):
+    if isinstance(graph, CSRGraph):
+        return graph
+    return from_networkx(graph)
+
+
+def as_networkx(graph):
+    if isinstance(graph, CSRGraph):
+        return graph.to_networkx()
+    return graph
+
+
+def connected_components(graph):
+    """ connected_components returns the connected components of graph as
+        sorted lists of nodes, in the order of their smallest node.
+    """
+    seen = [False] * len(graph)
+    components = []
+    for root in range(len(graph)):
+        if seen[root]:
+            continue
+        seen[root] = True
+        component = [root]
+        for i in component:
+            for j in graph.neighbors(i):
+                if not seen[j]:
+                    seen[j] = True
+                    component.append(j)
+        components.append(sorted(component))
+    return components
+
+
+def view(buffer, handle):
+    """ view returns the graph of handle over buffer without copying it. """
+    offset = handle.offset
+    itemsize = np.dtype(INDEX_DTYPE).itemsize
+    indptr = np.frombuffer(buffer, INDEX_DTYPE, handle.num_nodes + 1, offset)
+    offset += (handle.num_nodes + 1) * itemsize
+    indices = np.frombuffer(buffer, INDEX_DTYPE, handle.num_entries, offset)
+    offset += handle.num_entries * itemsize
+    coords = None
+    if handle.has_coords:
+        coords = np.frombuffer(buffer, COORD_DTYPE, 2 * handle.num_nodes,
+                               offset).reshape(-1, 2)
+    return CSRGraph(indptr, indices, coords)
+
+
+_blocks = {}
+_graphs = {}
+_unreleased = []
+
+
+def attach(handle):
+    """ attach returns the graph of handle. The block is mapped once per
+        process, and the graph built once per process, until the store
+        that owns it is closed.
+    """
+    graph = _graphs.get(handle.key())
+    if graph is None:
+        block = _blocks.get(handle.name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=handle.name)
+            _blocks[handle.name] = block
+        graph = view(block.buf, handle)
+        for array in [graph.indptr, graph.indices, graph.coords]:
+            if array is not None:
+                array.flags.writeable = False
+        _graphs[handle.key()] = graph
+    return graph
+
+
+class GraphStore(object):
+    """ GraphStore copies graphs into a new block of shared memory.
+        1. graphs are NetworkX graphs or CSRGraphs, and coords_list, if
+           given, holds the coordinates of every graph, or None.
+        2. handles lists the GraphHandle of every graph, in order.
+        3. The block is removed by close, or when a with statement ends,
+           and no graph of it may be used afterwards.
+    """
+    def __init__(self, graphs, coords_list=None):
+        graphs = [as_csr(graph) for graph in graphs]
+        if coords_list is not None:
+            graphs = [graph if coords is None else
+                          CSRGraph(graph.indptr, graph.indices,
+                                   np.asarray(coords, dtype=COORD_DTYPE))
+                          for graph, coords in zip(graphs, coords_list)]
+
+        sizes = [nbytes(len(graph), len(graph.indices),
+                        graph.coords is not None) for graph in graphs]
+        self.memory = shared_memory.SharedMemory(create=True,
+                                                 size=max(1, sum(sizes)))
+        self.handles = []
+        offset = 0
+        for graph, size in zip(graphs, sizes):
+            handle = GraphHandle(self.memory.name, offset, len(graph),
+                                 len(graph.indices),
+                                 graph.coords is not None)
+            shared = view(self.memory.buf, handle)
+            shared.indptr[:] = graph.indptr
+            shared.indices[:] = graph.indices
+            if shared.coords is not None:
+                shared.coords[:] = graph.coords.reshape(-1, 2)
+            del shared
+            self.handles.append(handle)
+            offset += size
+        _blocks[self.memory.name] = self.memory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for handle in self.handles:
+            _graphs.pop(handle.key(), None)
+        _blocks.pop(self.memory.name, None)
+        self.memory.unlink()
+        try:
+            self.memory.close()
+        except BufferError:
+            # Graphs of the block are still referenced, by the traceback
+            # of an error for instance. The block is unlinked, and is
+            # unmapped with the last of them.
+            _unreleased.append(self.memory)
@@ -0,0 +1,650 @@
+import gc
+import random
+import numpy as np
+import sleepwell, solo, solo2, desync
+import streams
+from node import logged_kinds
+from constants import INTERVAL, SIMULATION_DURATION
+
+""" Lockstep engines simulate one graph for a batch of seeds at once. State
+    is kept in (seed x node) arrays and every step processes the next event
+    of every seed, so the Python overhead is paid per step instead of per
+    seed.
+
+    Events are taken in the same (time, insertion count) order as the event
+    queue. A broadcast is delivered once every other event at the same time
+    has been processed, which is where the per-neighbor receptions land in
+    the queue. With the node streams of streams.SeedStreams, every node
+    draws its offsets and jitter from the same generators as in the event
+    simulator, so logs match it exactly. With the legacy RNG, the initial
+    offsets are drawn from the global RNG as main.simulate draws them and
+    jitter from a per-seed NumPy stream, so logs match the event simulator
+    when JITTER is 0 and match it in distribution otherwise.
+
+    DesyncEngine is the exception: it advances a whole interval per step.
+"""
+
+BLOCK_SIZE = 1024
+DEFAULT_OPTIONS = {"log_events": None, "path_vector": True, "clamping": True}
+NEVER = np.iinfo(np.int64).max
+
+BROADCAST = 0
+DEFICIT = 1
+RESET = 2
+ADJUST = 3
+KIND_NAMES = ["broadcast", "deficit", "reset", "adjust"]
+
+
+def neighbor_table(graph):
+    num_nodes = len(graph)
+    neighbors = [sorted(graph.neighbors(i)) for i in range(num_nodes)]
+    max_degree = max([len(l) for l in neighbors] + [1])
+
+    table = np.full((num_nodes, max_degree), -1, dtype=np.int64)
+    slots = np.zeros((num_nodes, max_degree), dtype=np.int64)
+    for i, l in enumerate(neighbors):
+        table[i, :len(l)] = l
+        for k, j in enumerate(l):
+            slots[i, k] = neighbors[j].index(i)
+    return table, slots
+
+
+def initial_offsets(seed_list, num_nodes):
+    offsets = np.zeros((len(seed_list), num_nodes), dtype=np.int64)
+    for s, seed in enumerate(seed_list):
+        random.seed(seed)
+        offsets[s] = [random.randint(0, INTERVAL - 1)
+                        for _ in range(num_nodes)]
+    return offsets
+
+
+def occurrence_rank(rows):
+    """ Returns how many times each element of rows occurred before it. """
+    order = np.argsort(rows, kind="stable")
+    sorted_rows = rows[order]
+    first = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    group_start = np.repeat(first, np.diff(np.r_[first, len(rows)]))
+    rank = np.empty(len(rows), dtype=np.int64)
+    rank[order] = np.arange(len(rows)) - group_start
+    return rank
+
+
+class RandomStream(object):
+    """ RandomStream draws integers in [low, high] for the nodes of every
+        seed, or for every seed if num_nodes is None, from one generator per
+        group of group_size nodes, seeded with the entropy of the group.
+        1. A generator is created on its first draw and draws a group_size x
+           block_size array at a time, whose row k is the next block of the
+           k-th node of the group, as streams.GroupDraws does. So the values
+           a node gets do not depend on the others in the batch.
+        2. The blocks of a group are kept until every node of it has read
+           them. A single draw may use the same node many times.
+    """
+    def __init__(self, entropy, low, high, block_size=BLOCK_SIZE,
+                 num_nodes=None, group_size=streams.GROUP_SIZE):
+        if num_nodes is None:
+            num_nodes, group_size = 1, 1
+        self.entropy = entropy
+        self.generators = [None] * len(entropy)
+        self.low = low
+        self.high = high
+        self.block_size = block_size
+        self.num_nodes = num_nodes
+        self.group_size = group_size
+        # Only the rows of the nodes there are are kept.
+        self.rows = min(group_size, num_nodes)
+        self.width = -(-num_nodes // group_size) * self.rows
+        self.block = np.zeros((len(entropy), self.rows, 2 * block_size),
+                              dtype=np.int64)
+        self.first = np.zeros(len(entropy), dtype=np.int64)
+        self.filled = np.zeros(len(entropy), dtype=np.int64)
+        position = np.zeros((len(entropy) * self.rows // self.width,
+                             self.width), dtype=np.int64)
+        position[:, num_nodes:] = NEVER
+        self.position = position.ravel()
+
+    def draw(self, rows, nodes):
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64)
+        if self.num_nodes == 1:
+            nodes = 0
+        index = rows * self.width + nodes
+        count = np.bincount(index, minlength=len(self.position))
+        position = self.position[index]
+        if count.max() > 1:
+            position = position + occurrence_rank(index)
+        groups = index // self.rows
+        short = position >= self.filled[groups]
+        while short.any():
+            self.refill(np.unique(groups[short]))
+            short = position >= self.filled[groups]
+        self.position += count
+        return self.block[groups, index % self.rows,
+                          position - self.first[groups]]
+
+    def refill(self, groups):
+        size = self.block_size
+        chunks = np.empty((len(groups), self.rows, size), dtype=np.int64)
+        for k, g in enumerate(groups.tolist()):
+            if self.generators[g] is None:
+                self.generators[g] = np.random.default_rng(self.entropy[g])
+            chunks[k] = self.generators[g].integers(
+                            self.low, self.high,
+                            size=(self.group_size, size),
+                            endpoint=True)[:self.rows]
+
+        lowest = self.position.reshape(-1, self.rows).min(axis=1)
+        read = (np.minimum(lowest[groups], self.filled[groups]) -
+                    self.first[groups]) // size * size
+        for g, count in zip(groups[read > 0].tolist(),
+                            read[read > 0].tolist()):
+            kept = self.filled[g] - self.first[g] - count
+            self.block[g, :, :kept] = self.block[g, :, count:count + kept]
+            self.first[g] += count
+        held = self.filled[groups] - self.first[groups]
+        end = held.max() + size
+        if end > self.block.shape[2]:
+            grown = np.zeros(self.block.shape[:2] + (2 * end,),
+                             dtype=np.int64)
+            grown[:, :, :self.block.shape[2]] = self.block
+            self.block = grown
+        if (held == end - size).all():
+            self.block[groups, :, end - size:end] = chunks
+        else:
+            columns = held[:, None, None] + np.arange(size)
+            self.block[groups[:, None, None], np.arange(self.rows)[:, None],
+                       columns] = chunks
+        self.filled[groups] += size
+
+
+def random_streams(seed_list, num_nodes, jitter, rng):
+    """ random_streams returns the initial offsets of a batch with the
+        streams of its jitter and reset offsets.
+        1. With rng "node", every node of every seed reads the generators of
+           streams.SeedStreams in the same blocks, and its initial offset is
+           the first of its offsets, so the batch draws exactly what the
+           event simulator draws.
+        2. With rng "legacy", the initial offsets come from the global RNG
+           and jitter and reset offsets from one stream per seed.
+    """
+    if rng == "legacy":
+        return (initial_offsets(seed_list, num_nodes),
+                RandomStream([[seed, 0] for seed in seed_list], -jitter,
+                             jitter),
+                RandomStream([[seed, 1] for seed in seed_list], 0,
+                             INTERVAL - 1))
+
+    num_groups = -(-num_nodes // streams.GROUP_SIZE)
+    keys = [(seed, g) for seed in seed_list for g in range(num_groups)]
+    jitter_random = RandomStream(
+                        [[seed, streams.JITTER_STREAM, g] for seed, g in keys],
+                        -jitter, jitter, streams.JITTER_BLOCK_SIZE, num_nodes)
+    offset_random = RandomStream(
+                        [[seed, streams.OFFSET_STREAM, g] for seed, g in keys],
+                        0, INTERVAL - 1, streams.OFFSET_BLOCK_SIZE, num_nodes)
+    rows = np.repeat(np.arange(len(seed_list)), num_nodes)
+    nodes = np.tile(np.arange(num_nodes), len(seed_list))
+    time = offset_random.draw(rows, nodes).reshape(len(seed_list), num_nodes)
+    return time, jitter_random, offset_random
+
+
+class Recorder(object):
+    """ Recorder collects log records of a batch as arrays and turns them
+        into per-seed logs in the format of the node classes. Only the kinds
+        selected by log_events, as the option of the same name in main, are
+        recorded.
+    """
+    module = None
+
+    def __init__(self, num_seeds, num_nodes, log_events=None):
+        self.num_seeds = num_seeds
+        self.num_nodes = num_nodes
+        self.records = []
+        self.kinds = logged_kinds(self.module.LOG_EVENTS, log_events)
+        self.logged = [kind in self.kinds for kind in KIND_NAMES]
+
+    def record(self, rows, time, nodes, kind, values=None):
+        if len(rows) == 0 or not self.logged[kind]:
+            return
+        self.records.append((rows, time, nodes, kind, values))
+
+    def logs(self):
+        init = "init" in self.kinds
+        logs = [[(0, i, "init", "None") for i in range(self.num_nodes)
+                    if init] for _ in range(self.num_seeds)]
+        if not self.records:
+            return logs
+
+        rows, time, nodes = [np.concatenate(c) for c in
+                                 list(zip(*self.records))[:3]]
+        kinds = np.repeat([r[3] for r in self.records],
+                          [len(r[0]) for r in self.records])
+        order = np.argsort(rows, kind="stable")
+        bounds = np.searchsorted(rows[order],
+                                 np.arange(self.num_seeds + 1)).tolist()
+        # Values are formatted by str, as the nodes do, once per distinct
+        # value of the kinds that have one.
+        values = np.full(len(rows), "None", dtype=object)
+        for kind in [DEFICIT, ADJUST]:
+            valued = [r[4] for r in self.records if r[3] == kind]
+            if valued:
+                unique, inverse = np.unique(np.concatenate(valued),
+                                            return_inverse=True)
+                text = np.array(list(map(str, unique.tolist())),
+                                dtype=object)
+                values[kinds == kind] = text[inverse]
+        names = np.array(KIND_NAMES, dtype=object)[kinds]
+        # The entries are many tuples of ints and strings, which cannot
+        # form cycles, so the collector is paused while they are built.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            entries = list(zip(time[order].tolist(), nodes[order].tolist(),
+                               names[order].tolist(),
+                               values[order].tolist()))
+            for row in range(self.num_seeds):
+                logs[row] += entries[bounds[row]:bounds[row + 1]]
+        finally:
+            if collecting:
+                gc.enable()
+        return logs
+
+
+class Engine(Recorder):
+    """ Engine holds the state shared by the algorithms and runs the
+        lockstep loop.
+        1. Every step picks the next event of each seed. An event is either
+           a start or a timer expiry, and both broadcast first.
+        2. Pending broadcasts of a seed are delivered before its next event
+           if that event is later, in the order they were broadcast.
+        3. Subclasses implement fire() for the event after the broadcast and
+           receive() for the receptions of a delivered broadcast.
+        The neighbor map of a node is a row of offsets indexed by neighbor
+        slot, with -1 for neighbors not heard yet.
+    """
+    def __init__(self, graph, seed_list, algorithm, rng="node",
+                 options=None):
+        options = options or DEFAULT_OPTIONS
+        super().__init__(len(seed_list), len(graph), options["log_events"])
+        self.table, self.slots = neighbor_table(graph)
+        shape = (self.num_seeds, self.num_nodes)
+
+        self.time, self.jitter, self.offset_random = \
+            random_streams(seed_list, self.num_nodes, self.module.JITTER, rng)
+        self.order = np.tile(np.arange(self.num_nodes), (self.num_seeds, 1))
+        self.counter = self.num_nodes
+        self.on = np.zeros(shape, dtype=bool)
+        self.my_slot = np.zeros(shape, dtype=bool)
+        self.latest_broadcast = np.zeros(shape, dtype=np.int64)
+        self.known = np.zeros(shape, dtype=np.int64)
+        self.neighbor_map = np.full(shape + (self.table.shape[1],), -1,
+                                    dtype=np.int64)
+        self.pending = np.full(shape, -1, dtype=np.int64)
+        self.pending_time = np.zeros(self.num_seeds, dtype=np.int64)
+        self.done = np.zeros(self.num_seeds, dtype=bool)
+
+    def close_slot(self, rows, nodes, now):
+        target_share = INTERVAL // (self.known[rows, nodes] + 1)
+        my_share = now - self.latest_broadcast[rows, nodes]
+        deficit = (target_share - my_share) / target_share
+        self.record(rows, now, nodes, DEFICIT, deficit)
+        self.my_slot[rows, nodes] = False
+
+    def set_timer(self, rows, nodes, now, interval):
+        self.schedule(rows, nodes, now + interval +
+                          self.jitter.draw(rows, nodes))
+
+    def schedule(self, rows, nodes, time):
+        self.time[rows, nodes] = time
+        self.order[rows, nodes] = self.counter + np.arange(len(rows))
+        self.counter += len(rows)
+
+    def run(self, duration=SIMULATION_DURATION):
+        while not self.done.all():
+            self.deliver_pending(self.time.min(axis=1))
+
+            rows = np.flatnonzero(~self.done)
+            time = self.time[rows]
+            next_time = time.min(axis=1)
+            tied = time == next_time[:, None]
+            nodes = np.where(tied, self.order[rows], NEVER).argmin(axis=1)
+            self.step(rows, nodes, next_time)
+            self.done[rows] = next_time >= duration
+        return self.logs()
+
+    def step(self, rows, nodes, now):
+        started = self.on[rows, nodes]
+        self.on[rows, nodes] = True
+        self.broadcast(rows, nodes, now)
+        self.fire(rows, nodes, now, started)
+
+    def broadcast(self, rows, nodes, now):
+        self.pending[rows, nodes] = self.counter
+        self.pending_time[rows] = now
+        self.counter += 1
+
+        self.record(rows, now, nodes, BROADCAST)
+        closing = self.my_slot[rows, nodes]
+        self.close_slot(rows[closing], nodes[closing], now[closing])
+        self.my_slot[rows, nodes] = True
+        self.latest_broadcast[rows, nodes] = now
+
+    def deliver_pending(self, next_time):
+        due = (self.pending >= 0).any(axis=1) & \
+                  (self.pending_time < next_time) & ~self.done
+        while due.any():
+            rows = np.flatnonzero(due)
+            pending = np.where(self.pending[rows] >= 0, self.pending[rows],
+                               NEVER)
+            sources = pending.argmin(axis=1)
+            self.deliver(rows, sources, self.pending_time[rows])
+            self.pending[rows, sources] = -1
+            due = (self.pending >= 0).any(axis=1) & due
+
+    def deliver(self, rows, sources, now):
+        receivers = self.table[sources]
+        slots = self.slots[sources]
+        shape = receivers.shape
+        row_index = np.broadcast_to(rows[:, None], shape)
+        valid = receivers >= 0
+        receivers = np.where(valid, receivers, 0)
+        listening = valid & self.on[row_index, receivers]
+
+        self.receive(row_index[listening], receivers[listening],
+                     slots[listening],
+                     np.broadcast_to(sources[:, None], shape)[listening],
+                     np.broadcast_to(now[:, None], shape)[listening])
+
+    def update_neighbor_map(self, rows, receivers, slots, now):
+        heard = self.neighbor_map[rows, receivers, slots] >= 0
+        self.known[rows[~heard], receivers[~heard]] += 1
+        self.neighbor_map[rows, receivers, slots] = now % INTERVAL
+
+class SleepWellEngine(Engine):
+    """ SleepWellEngine follows the rules of sleepwell.SleepWellNode. """
+    module = sleepwell
+
+    def __init__(self, graph, seed_list, algorithm, rng="node",
+                 options=None):
+        super().__init__(graph, seed_list, algorithm, rng, options)
+        self.deficit_count = np.zeros(self.time.shape, dtype=np.int64)
+
+    def fire(self, rows, nodes, now, started):
+        interval = np.full(len(rows), INTERVAL, dtype=np.int64)
+        interval[started] = self.adjust(rows[started], nodes[started],
+                                        now[started])
+        self.set_timer(rows, nodes, now, interval)
+
+    def receive(self, rows, receivers, slots, sources, now):
+        self.update_neighbor_map(rows, receivers, slots, now)
+        closing = self.my_slot[rows, receivers]
+        self.close_slot(rows[closing], receivers[closing], now[closing])
+
+    def adjust(self, rows, nodes, now):
+        interval = np.full(len(rows), INTERVAL, dtype=np.int64)
+        my_offset = now % INTERVAL
+        offsets = self.neighbor_map[rows, nodes]
+        heard = offsets >= 0
+        count = self.known[rows, nodes]
+
+        distance = np.where(heard, (offsets - my_offset[:, None]) % INTERVAL,
+                            INTERVAL)
+        my_share = distance.min(axis=1)
+        target_share = INTERVAL // (count + 1)
+        satisfied = my_share - target_share > -1e-3 * INTERVAL
+        deficit = (count > 0) & ~satisfied
+        if not deficit.any():
+            return interval
+
+        rows = rows[deficit]
+        nodes = nodes[deficit]
+        self.deficit_count[rows, nodes] += 1
+        reset = self.deficit_count[rows, nodes] == sleepwell.MAX_DEFICIT_COUNT
+        self.deficit_count[rows[reset], nodes[reset]] = 0
+        self.record(rows[reset], now[deficit][reset], nodes[reset], RESET)
+
+        start, end = self.largest_gap(offsets[deficit], count[deficit])
+        half_gap = ((end - start) % INTERVAL) // 2
+        target_share = target_share[deficit]
+        new_offset = np.where(half_gap > target_share,
+                              (start + half_gap) % INTERVAL,
+                              (end - target_share) % INTERVAL)
+        new_offset[reset] = self.offset_random.draw(rows[reset],
+                                                    nodes[reset])
+
+        new_interval = (new_offset - my_offset[deficit]) % INTERVAL
+        new_interval[new_interval <= INTERVAL // 2] += INTERVAL
+        interval[deficit] = new_interval
+        return interval
+
+    def largest_gap(self, offsets, count):
+        starts = np.sort(np.where(offsets >= 0, offsets, 2 * INTERVAL),
+                         axis=1)
+        index = np.arange(starts.shape[1])
+        following = np.where(index + 1 < count[:, None], index + 1, 0)
+        ends = np.take_along_axis(starts, following, axis=1)
+        gaps = np.where(index < count[:, None], (ends - starts) % INTERVAL,
+                        -1)
+        largest = gaps.argmax(axis=1)[:, None]
+        return (np.take_along_axis(starts, largest, axis=1)[:, 0],
+                np.take_along_axis(ends, largest, axis=1)[:, 0])
+
+
+class SoloEngine(Engine):
+    """ SoloEngine follows the rules of solo.SoloNode. The degree sent with
+        a beacon is kept with the pending broadcast until it is delivered.
+    """
+    module = solo
+
+    def __init__(self, graph, seed_list, algorithm, rng="node",
+                 options=None):
+        super().__init__(graph, seed_list, algorithm, rng, options)
+        self.alpha = algorithm["alpha"]
+        self.next_broadcast = np.zeros(self.time.shape, dtype=np.int64)
+        self.sent_degree = np.zeros(self.time.shape, dtype=np.int64)
+
+    def broadcast(self, rows, nodes, now):
+        self.sent_degree[rows, nodes] = self.known[rows, nodes]
+        super().broadcast(rows, nodes, now)
+
+    def fire(self, rows, nodes, now, started):
+        self.set_timer(rows, nodes, now, INTERVAL)
+        self.next_broadcast[rows, nodes] = now + INTERVAL
+
+    def receive(self, rows, receivers, slots, sources, now):
+        closing = self.my_slot[rows, receivers]
+        self.close_slot(rows[closing], receivers[closing], now[closing])
+        self.update_neighbor_map(rows, receivers, slots, now)
+
+        degree = self.sent_degree[rows, sources]
+        next_bc = self.next_broadcast[rows, receivers]
+        target_share = INTERVAL // (np.maximum(degree, 1) + 1)
+        your_share = next_bc - now
+        moving = your_share - target_share <= -1e-3 * INTERVAL
+
+        target_bc = now + target_share
+        new_bc = (next_bc * (100 - self.alpha) + target_bc * self.alpha) \
+                    // 100
+        moving &= new_bc > next_bc
+        rows, receivers = rows[moving], receivers[moving]
+        self.next_broadcast[rows, receivers] = new_bc[moving]
+        self.set_timer(rows, receivers, now[moving],
+                       new_bc[moving] - now[moving])
+
+
+class Solo2Engine(SoloEngine):
+    """ Solo2Engine follows the rules of solo2.SoloNode, honoring the
+        path_vector and clamping options. A path vector is a row of
+        flags over node ids, copied into the pending broadcast when sent.
+    """
+    module = solo2
+
+    def __init__(self, graph, seed_list, algorithm, rng="node",
+                 options=None):
+        super().__init__(graph, seed_list, algorithm, rng, options)
+        options = options or DEFAULT_OPTIONS
+        self.path_vector_enabled = options["path_vector"]
+        self.clamping_enabled = options["clamping"]
+        shape = self.time.shape + (self.num_nodes,)
+        self.path_vector = np.zeros(shape, dtype=bool)
+        self.sent_path_vector = np.zeros(shape, dtype=bool)
+
+    def broadcast(self, rows, nodes, now):
+        self.sent_path_vector[rows, nodes] = self.path_vector[rows, nodes]
+        self.path_vector[rows, nodes] = False
+        super().broadcast(rows, nodes, now)
+
+    def receive(self, rows, receivers, slots, sources, now):
+        closing = self.my_slot[rows, receivers]
+        self.close_slot(rows[closing], receivers[closing], now[closing])
+        self.update_neighbor_map(rows, receivers, slots, now)
+
+        degree = self.sent_degree[rows, sources]
+        next_bc = self.next_broadcast[rows, receivers]
+        target_share = INTERVAL // (np.maximum(degree, 1) + 1)
+        your_share = next_bc - now
+        moving = your_share - target_share <= -1e-3 * INTERVAL
+        rows, receivers, sources = rows[moving], receivers[moving], \
+                                       sources[moving]
+        now, next_bc = now[moving], next_bc[moving]
+        target_share = target_share[moving]
+
+        if self.path_vector_enabled:
+            your_pv = self.sent_path_vector[rows, sources]
+            loop = your_pv[np.arange(len(rows)), receivers]
+            self.reset(rows[loop], receivers[loop], now[loop])
+
+            keep = ~loop
+            rows, receivers, sources = rows[keep], receivers[keep], \
+                                           sources[keep]
+            now, next_bc = now[keep], next_bc[keep]
+            target_share = target_share[keep]
+            your_pv = your_pv[keep]
+            your_pv[np.arange(len(rows)), sources] = True
+            self.path_vector[rows, receivers] = your_pv
+
+        target_bc = now + target_share
+        if self.clamping_enabled:
+            target_bc = np.minimum(target_bc,
+                                   self.successor_expiry(rows, receivers))
+
+        new_bc = (next_bc * (100 - self.alpha) + target_bc * self.alpha) \
+                    // 100
+        self.next_broadcast[rows, receivers] = new_bc
+        self.set_timer(rows, receivers, now, new_bc - now)
+
+    def reset(self, rows, nodes, now):
+        self.path_vector[rows, nodes] = False
+        self.record(rows, now, nodes, RESET)
+        self.on[rows, nodes] = False
+        self.schedule(rows, nodes,
+                      now + self.offset_random.draw(rows, nodes))
+
+    def successor_expiry(self, rows, nodes):
+        next_bc = self.next_broadcast[rows, nodes]
+        offsets = self.neighbor_map[rows, nodes]
+        distance = np.where(offsets >= 0,
+                            (offsets - next_bc[:, None]) % INTERVAL,
+                            INTERVAL)
+        return next_bc + distance.min(axis=1)
+
+
+class DesyncEngine(Recorder):
+    """ DesyncEngine advances DESYNC one interval at a time for all nodes.
+        1. Every node fires once per interval. The successor of a node is
+           the neighbor that fires next after it, and its predecessor is the
+           neighbor that fired last before it. Both are found on the ring of
+           neighbor firing times, assuming a neighbor fires again INTERVAL
+           after its current firing.
+        2. At the successor's firing the node closes its slot and adjusts by
+           ALPHA * (next - prev) // 200, where prev is measured from the
+           firing the node had planned, as desync.DesyncNode does. In the
+           first interval prev is INTERVAL - next.
+        3. A node without neighbors closes its slot at its next firing.
+        This is the round-based model of DESYNC rather than a replay of the
+        event order, so it agrees with desync.DesyncNode in distribution but
+        not event by event.
+    """
+    module = desync
+
+    def __init__(self, graph, seed_list, algorithm, rng="node",
+                 options=None):
+        options = options or DEFAULT_OPTIONS
+        super().__init__(len(seed_list), len(graph), options["log_events"])
+        self.table, _ = neighbor_table(graph)
+        self.alpha = algorithm["alpha"]
+        self.time, self.jitter, _ = random_streams(seed_list, self.num_nodes,
+                                                   desync.JITTER, rng)
+        self.planned = None
+
+    def run(self, duration=SIMULATION_DURATION):
+        self.duration = duration
+        valid = self.table >= 0
+        degree = valid.sum(axis=1)
+        lonely = degree == 0
+        rows = np.repeat(np.arange(self.num_seeds), self.num_nodes)
+        nodes = np.tile(np.arange(self.num_nodes), self.num_seeds)
+
+        while self.time.min() < duration:
+            now = self.time
+            neighbor_time = now[:, np.where(valid, self.table, 0)]
+            ahead = neighbor_time - now[:, :, None]
+            _next = np.where(ahead > 0, ahead, ahead + INTERVAL)
+            _next = np.where(valid, _next, NEVER).min(axis=2)
+            behind = now[:, :, None] - neighbor_time
+            behind = np.where(behind > 0, behind, behind + INTERVAL)
+            predecessor = now - np.where(valid, behind, NEVER).min(axis=2)
+
+            if self.planned is None:
+                _prev = INTERVAL - _next
+                heard = (ahead > 0) & (ahead <= _next[:, :, None]) & valid
+                known = heard.sum(axis=2)
+            else:
+                _prev = (self.planned - predecessor) % INTERVAL
+                known = np.broadcast_to(degree, now.shape)
+            adjustment = self.alpha * (_next - _prev) // 200
+            adjustment[:, lonely] = 0
+
+            successor = now + _next
+            target_share = INTERVAL // (known + 1)
+            deficit = (target_share - _next) / target_share
+            later = now + INTERVAL + adjustment + \
+                        self.jitter.draw(rows, nodes).reshape(now.shape)
+            lonely_share = later - now
+            deficit[:, lonely] = ((INTERVAL - lonely_share) / INTERVAL)[:,
+                                                                      lonely]
+            closed = np.where(lonely, later, successor)
+
+            self.record_all(rows, nodes, now, BROADCAST)
+            self.record_all(rows, nodes, closed, DEFICIT, deficit)
+            linked = np.broadcast_to(~lonely, now.shape)
+            self.record_all(rows[linked.ravel()], nodes[linked.ravel()],
+                            successor[linked], ADJUST,
+                            adjustment[linked] / INTERVAL)
+
+            self.planned = now + INTERVAL
+            self.time = later
+        return self.logs()
+
+    def record_all(self, rows, nodes, time, kind, values=None):
+        time = time.ravel()
+        keep = time < self.duration
+        if values is not None:
+            values = values.ravel()[keep]
+        self.record(rows[keep], time[keep], nodes[keep], kind, values)
+
+
+ENGINES = {"sleepwell": SleepWellEngine, "solo": SoloEngine,
+           "solo2": Solo2Engine, "desync": DesyncEngine}
+
+
+def simulate(graph, seed_list, algorithm, duration=SIMULATION_DURATION,
+             rng="node", options=None):
+    """ simulate runs algorithm on graph for every seed of seed_list and
+        returns their logs. options holds the log_events, path_vector and
+        clamping options of main, which default to DEFAULT_OPTIONS, and
+        the node modules are not read for them.
+    """
+    engine = ENGINES[algorithm["type"]](graph, seed_list, algorithm, rng,
+                                        options)
+    return engine.run(duration)
@@ -0,0 +1,96 @@
+import itertools
+import binlog
+from monitor import TOLERANCE
+from constants import INTERVAL
+
+BUFFER_RECORDS = 1 << 16
+
+class LogWriter(object):
+    """ LogWriter writes a log in chunks, so that a simulation can flush
+        its events to disk while it runs.
+        1. Every chunk is sorted before it is written. Chunks must be given
+           in time order, which makes the file equal to the whole log sorted.
+        2. A chunk may be given as several logs, such as one per node, which
+           are concatenated into one list and sorted. As a node logs its
+           events in time order, the list is made of sorted runs, which the
+           sort merges. The records are formatted and written BUFFER_RECORDS
+           at a time, so that no formatted copy of the whole chunk is kept.
+        3. The format is either text lines or binary records of binlog.
+        4. With run_length, broadcasts of a node that follow the previous
+           one by INTERVAL within TOLERANCE are collapsed into a periodic
+           record "end,node,periodic,start:period:count", stamped with the
+           last broadcast of the run. The first two broadcasts of a node and
+           every broadcast after a bad gap are kept, so the converge time,
+           final offsets and broadcast counts can be read without expanding
+           the runs. A run is cut at the end of every chunk.
+    """
+    def __init__(self, output_file, log_format="text", run_length=False):
+        self.output_file = output_file
+        self.log_format = log_format
+        self.run_length = run_length
+        if log_format == "binary":
+            self.fo = open(output_file, "wb")
+            self.fo.write(binlog.MAGIC)
+        else:
+            self.fo = open(output_file, "w")
+        self.num_records = 0
+
+        self.latest_broadcast = {}
+        self.num_broadcasts = {}
+
+    def write(self, log):
+        self.merge([log])
+
+    def merge(self, logs):
+        log = sorted(itertools.chain.from_iterable(logs))
+        if self.run_length:
+            log = sorted(self.collapse(log))
+        for i in range(0, len(log), BUFFER_RECORDS):
+            self.write_buffer(log[i:i + BUFFER_RECORDS])
+
+    def write_buffer(self, log):
+        if self.log_format == "binary":
+            binlog.write_records(log, self.fo)
+        elif log:
+            self.fo.write("\n".join(["%d,%d,%s,%s" % tup for tup in log]) +
+                          "\n")
+        self.num_records += len(log)
+
+    def close(self):
+        if self.log_format != "binary" and self.num_records == 0:
+            self.fo.write("\n")
+        self.fo.close()
+
+    def collapse(self, log):
+        collapsed = []
+        runs = {}
+        for entry in log:
+            now, node_id, kind, _ = entry
+            if kind != "broadcast":
+                collapsed.append(entry)
+                continue
+
+            latest = self.latest_broadcast.get(node_id)
+            count = self.num_broadcasts.get(node_id, 0) + 1
+            self.latest_broadcast[node_id] = now
+            self.num_broadcasts[node_id] = count
+            if count > 2 and abs(now - latest - INTERVAL) <= TOLERANCE:
+                run = runs.setdefault(node_id, [now, 0, now])
+                run[1] += 1
+                run[2] = now
+            else:
+                if node_id in runs:
+                    collapsed.append(self.close_run(node_id,
+                                                    runs.pop(node_id)))
+                collapsed.append(entry)
+
+        for node_id, run in runs.items():
+            collapsed.append(self.close_run(node_id, run))
+        return collapsed
+
+    def close_run(self, node_id, run):
+        start, count, end = run
+        if count == 1:
+            return (start, node_id, "broadcast", "None")
+        period = (end - start) // (count - 1)
+        return (end, node_id, "periodic", "%d:%d:%d" % (start, period, count))
@@ -1,11 +1,19 @@
 import argparse
+import collections
 import os, sys
 import random
-import itertools
-import multiprocessing as mp
 import networkx as nx
 import pqueue as pq
 import sleepwell, solo, solo2, desync
+import lockstep
+import metrics
+import graphstore
+import parallel
+import pdes
+from logwriter import LogWriter
+from monitor import ConvergenceMonitor
+from node import connect, logged_kinds
+from streams import SeedStreams, RNG_MODES
 import graph as graphutils
 from constants import INTERVAL, SIMULATION_DURATION
 
@@ -15,6 +23,30 @@ Usage:
     ./main.py --graph-dir DIR --seed INTEGER --algo STRING --outdir DIR
     ./main.py --graph FILE1 --seed INTEGER --algo STRING --outdir DIR \
             --alpha 0.5
+    ./main.py --graph-dir DIR --seed-list FILE --algo STRING --outdir DIR \
+            --scheduler calendar --fanout
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --alpha 50 \
+            --outdir DIR --engine numpy
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --early-stop 5 --detect-cycles
+    ./main.py --graph-dir DIR --seed-list FILE --algo solo2 --alpha 87 \
+            --outdir DIR --summary --no-log
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --log-events broadcast,reset
+    ./main.py --graph FILE --seed INTEGER --algo sleepwell --outdir DIR \
+            --duration 5000 --flush-interval 100
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --log-format binary
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --run-length
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --rng legacy
+    ./main.py --graph-dir DIR --seed-list FILE --algo sleepwell --outdir DIR \
+            --workers 64 --seed-chunk 20
+    ./main.py --graph FILE --seed INTEGER --algo sleepwell --outdir DIR \
+            --components --workers 16
+    ./main.py --graph FILE --seed INTEGER --algo sleepwell --outdir DIR \
+            --partitions 8
 """
 
 
@@ -24,9 +56,60 @@ def save_parameters(parameters, outdir):
         fo.write(parameters + "\n")
 
 
-def test_instance(graph_file, seed, algorithm, output_file):
-    graph = nx.read_adjlist(graph_file)
-    graph = graphutils.convert_nodes_to_integers(graph)
+ALGORITHMS = {"sleepwell": sleepwell, "solo": solo, "solo2": solo2,
+              "desync": desync}
+DEFAULT_OPTIONS = {"engine": "event", "scheduler": "heap", "fanout": False,
+                   "compact_ratio": pq.COMPACT_RATIO, "path_vector": True,
+                   "clamping": True, "early_stop": 0,
+                   "detect_cycles": False, "summary": False,
+                   "log_events": None, "log_format": "text",
+                   "duration": SIMULATION_DURATION, "log_tail": 0,
+                   "flush_interval": 0, "run_length": False, "rng": "node",
+                   "seed_chunk": 0, "workers": None, "chunksize": 1,
+                   "components": False, "partitions": 0}
+LOG_EVENTS = ["broadcast", "deficit", "reset", "adjust"]
+TASKS_PER_WORKER = 4
+MAX_SEED_CHUNK = 100
+COMPONENT_PARALLEL_SIZE = 200
+
+
+def make_options(**kwargs):
+    options = dict(DEFAULT_OPTIONS)
+    options.update(kwargs)
+    return options
+
+
+def configure(algorithm, options):
+    module = ALGORITHMS[algorithm["type"]]
+    module.CONFIG_FANOUT = options["fanout"]
+    module.CONFIG_LOG_EVENTS = logged_kinds(module.LOG_EVENTS,
+                                            options["log_events"])
+    if module is solo2:
+        solo2.CONFIG_PATH_VECTOR = options["path_vector"]
+        solo2.CONFIG_CLAMPING = options["clamping"]
+    if hasattr(module, "ALPHA"):
+        module.ALPHA = algorithm["alpha"]
+
+
+def flush_logs(node_list, preamble, writer):
+    writer.merge([preamble] + [node.log for node in node_list])
+    preamble.clear()
+    for node in node_list:
+        node.log.clear()
+
+
+def simulate(graph, seed, algorithm, options=None, writer=None,
+             labels=None):
+    """ simulate runs one instance of algorithm on graph and returns its
+        nodes, their logs and counters of the run.
+        1. With labels, only the nodes labels of graph are simulated, which
+           must be closed under neighbors. Node i is logged and observed as
+           i, but keeps the random streams of node labels[i].
+        2. With labels, held records the logs and summary right before the
+           first event at or past the duration, which is still executed.
+    """
+    if options is None:
+        options = DEFAULT_OPTIONS
 
     random.seed(seed)
 
@@ -34,91 +117,369 @@ def test_instance(graph_file, seed, algorithm, output_file):
         Node = sleepwell.SleepWellNode
     elif algorithm["type"] == "solo":
         Node = solo.SoloNode
-        solo.ALPHA = algorithm["alpha"]
     elif algorithm["type"] == "solo2":
         Node = solo2.SoloNode
-        solo2.ALPHA = algorithm["alpha"]
     elif algorithm["type"] == "desync":
         Node = desync.DesyncNode
-        desync.ALPHA = algorithm["alpha"]
+    configure(algorithm, options)
 
-    queue = pq.PriorityQueue()
-    num_nodes = len(graph)
-    offset_list = [random.randint(0, INTERVAL - 1) for _ in range(num_nodes)]
-    node_list = [Node(i, queue) for i in range(num_nodes)]
+    Queue = pq.SCHEDULERS[options["scheduler"]]
+    queue = Queue(compact_ratio=options["compact_ratio"])
+    num_nodes = len(graph) if labels is None else len(labels)
+    if options["rng"] == "legacy":
+        offset_list = [random.randint(0, INTERVAL - 1)
+                          for _ in range(num_nodes)]
+        node_list = [Node(i, queue) for i in range(num_nodes)]
+    else:
+        jitter = ALGORITHMS[algorithm["type"]].JITTER
+        node_list = [Node(i, queue) for i in range(num_nodes)]
+        stream_ids = range(num_nodes) if labels is None else labels
+        seed_streams = SeedStreams(seed, stream_ids, jitter)
+        for node in node_list:
+            node.stream = seed_streams.stream(stream_ids[node.node_id])
+        offset_list = [node.stream.offset() for node in node_list]
 
+    connect(node_list, graph, labels)
     for i, node in enumerate(node_list):
-        node.set_links([node_list[j] for j in graph.neighbors(i)])
         queue.add_task((node.start, (None,)), offset_list[i])
+
+    preamble = []
+    if options["log_tail"] > 0:
+        for node in node_list:
+            preamble += node.log
+            node.log = collections.deque(maxlen=options["log_tail"])
+
+    duration = options["duration"]
+    flush_every = options["flush_interval"] * INTERVAL
+    next_flush = float("inf")
+    if writer is not None and flush_every > 0:
+        next_flush = flush_every
+
+    monitor = None
+    observer = None
+    if options["early_stop"] > 0 or options["detect_cycles"] or \
+            options["summary"]:
+        monitor = ConvergenceMonitor(num_nodes, options["early_stop"],
+                                     options["detect_cycles"], duration)
+        observer = monitor
+    if options["summary"]:
+        if labels is not None:
+            graph = nx.relabel_nodes(graph.subgraph(labels),
+                                     dict(zip(labels, range(num_nodes))))
+        observer = metrics.ObserverGroup(
+                        [monitor] + [Metric(graph) for _, Metric in
+                                        sorted(metrics.METRICS.items())])
+    for node in node_list:
+        node.observer = observer
     
-    while queue.current < SIMULATION_DURATION:
+    hold = duration if labels is not None else float("inf")
+    held = None
+    num_events = 0
+    while queue.current < duration:
         func, argv = queue.pop_task()
+        if queue.current >= next_flush:
+            flush_logs(node_list, preamble, writer)
+            next_flush = (queue.current // flush_every + 1) * flush_every
+        if queue.current >= hold:
+            held = {"time": queue.current, "events": num_events,
+                    "lengths": [len(node.log) for node in node_list],
+                    "summary": None}
+            if observer is not None:
+                held["summary"] = observer.summary(queue.current)
         func(*argv)
+        num_events += 1
+        if monitor is not None and monitor.done:
+            break
     
-    log = []
-    for i, node in enumerate(node_list):
-        log += node.log
-    log = sorted(log)
-    log = ["%d,%d,%s,%s" % tup for tup in log]
+    result = {"nodes": node_list, "logs": [node.log for node in node_list],
+              "events": num_events, "queue": queue.stats(),
+              "time": queue.current, "preamble": preamble, "summary": None,
+              "saved": 0, "held": held}
+    if observer is not None:
+        result["summary"] = observer.summary(queue.current)
+    if monitor is not None and monitor.done:
+        result["saved"] = (duration - queue.current) / INTERVAL
+    return result
+
+
+def simulate_component(task):
+    """ simulate_component simulates the connected component labels of the
+        graph of source and returns its logs, and what was held before its
+        last event, with the node ids of the graph.
+    """
+    source, seed, algorithm, options, labels = task
+    graph = graphutils.open_graph(source)
+    result = simulate(graph, seed, algorithm, options, labels=labels)
+    held = result["held"]
+    return {"logs": [[(time, label, kind, value)
+                         for time, _, kind, value in log]
+                        for label, log in zip(labels, result["logs"])],
+            "events": result["events"], "time": result["time"],
+            "summary": metrics.relabel_summary(result["summary"], labels),
+            "held_events": held["events"], "held_time": held["time"],
+            "held_lengths": held["lengths"],
+            "held_summary": metrics.relabel_summary(held["summary"],
+                                                    labels)}
 
-    with open(output_file, "w") as fo:
-        fo.write("\n".join(log) + "\n")
+
+def component_cost(task):
+    return len(task[-1])
+
+
+def simulate_components(source, seed, algorithm, options):
+    """ simulate_components simulates every connected component of the
+        graph of source, a graph file or a graphstore.GraphHandle, on its
+        own event queue, and merges them into the result simulate returns
+        for the whole graph.
+        1. Nodes keep the random streams of their id in the graph, so with
+           rng "node" every component runs as it does in a single queue.
+        2. Components of COMPONENT_PARALLEL_SIZE nodes or more run in a pool
+           of options["workers"] processes if there are two of them or more,
+           which read the graph from a graphstore.GraphStore. Smaller
+           components run in this process.
+        3. A single queue stops after the first event at or past the
+           duration, which belongs to one component, so the results are
+           merged by merge_held. If the last events of two components have
+           the same time, the one with the smallest node keeps it.
+        Early stop, cycle detection, log tails and flushes need the state
+        of the whole graph and are not supported.
+    """
+    graph = graphutils.open_graph(source)
+    components = graphstore.connected_components(graph)
+    large = [i for i, labels in enumerate(components)
+                if len(labels) >= COMPONENT_PARALLEL_SIZE]
+
+    store = None
+    workers = 1
+    if len(large) > 1:
+        workers = options["workers"]
+        if not isinstance(source, graphstore.GraphHandle):
+            store = graphstore.GraphStore([graph])
+            source = store.handles[0]
+    tasks = [(source, seed, algorithm, options, labels)
+                for labels in components]
+
+    results = [None] * len(tasks)
+    try:
+        for index, result in parallel.stream(simulate_component,
+                                             [tasks[i] for i in large],
+                                             workers, cost=component_cost):
+            results[large[index]] = result
+        for i, task in enumerate(tasks):
+            if results[i] is None:
+                results[i] = simulate_component(task)
+    finally:
+        if store is not None:
+            store.close()
+    return merge_held(results, options)
+
+
+def merge_held(results, options):
+    """ merge_held merges the results of parts of a graph simulated on
+        separate queues. Only the part with the earliest event at or past
+        the duration keeps it, and the others are cut right before theirs.
+    """
+    held_times = [result["held_time"] for result in results]
+    last = held_times.index(min(held_times))
+    logs = []
+    summaries = []
+    num_events = 0
+    for i, result in enumerate(results):
+        if i == last:
+            logs += result["logs"]
+            summaries.append(result["summary"])
+            num_events += result["events"]
+        else:
+            logs += [log[:length] for log, length in
+                        zip(result["logs"], result["held_lengths"])]
+            summaries.append(result["held_summary"])
+            num_events += result["held_events"]
+
+    summary = None
+    if options["summary"]:
+        summary = metrics.merge_summaries(summaries)
+    return {"nodes": None, "logs": logs, "events": num_events,
+            "queue": None, "time": held_times[last], "preamble": [],
+            "summary": summary, "saved": 0, "held": None}
+
+
+def summarize(source, seed, algorithm, options=None):
+    graph = graphutils.open_graph(source)
+    
+    options = make_options(**(options or {}))
+    options["summary"] = True
+    options["log_events"] = []
+    return simulate(graph, seed, algorithm, options)["summary"]
+
+
+def test_instance(source, seed, algorithm, output_file, options=None):
+    graph = graphutils.open_graph(source)
+
+    if options is None:
+        options = DEFAULT_OPTIONS
+    writer = LogWriter(output_file, options["log_format"],
+                       options["run_length"])
+    if options["components"]:
+        result = simulate_components(source, seed, algorithm, options)
+    elif options["partitions"] > 1:
+        configure(algorithm, options)
+        result = merge_held(pdes.simulate(graph, seed, options,
+                                          options["partitions"]), options)
+    else:
+        result = simulate(graph, seed, algorithm, options, writer)
+
+    logs = [result["preamble"]] + result["logs"]
+    if result["summary"] is not None:
+        logs.append(metrics.summary_records(result["summary"],
+                                            result["time"]))
+    writer.merge(logs)
+    writer.close()
+
+    print("Log saved in ./%s." % output_file)
+    return result["saved"]
+
+
+def test_batch(source, seed_list, algorithm, output_files, options=None):
+    if options is None:
+        options = DEFAULT_OPTIONS
+    if options["engine"] == "event":
+        return sum(test_instance(source, seed, algorithm, output_file,
+                                 options)
+                       for seed, output_file in zip(seed_list, output_files))
+
+    graph = graphutils.open_graph(source)
+
+    logs = lockstep.simulate(graph, seed_list, algorithm,
+                             options["duration"], options["rng"], options)
+    for log, output_file in zip(logs, output_files):
+        write_log(log, output_file, options["log_format"],
+                  options["run_length"])
+    return 0
+
+
+def log_extension(options):
+    if options is not None and options["log_format"] == "binary":
+        return "bin"
+    return "txt"
+
+
+def write_log(log, output_file, log_format="text", run_length=False):
+    writer = LogWriter(output_file, log_format, run_length)
+    writer.write(log)
+    writer.close()
 
     print("Log saved in ./%s." % output_file)
 
 
-def test_single_graph(graph_file, seed_list, algorithm, outdir):
-    file_list = [None for _ in range(len(seed_list))]
-    for i, seed in enumerate(seed_list):
-        file_list[i] = "seed-%d.txt" % seed
-        output_file = os.path.join(outdir, file_list[i])
-        test_instance(graph_file, seed, algorithm, output_file)
+def report_saved(saved, num_instances, options):
+    if options is None or not (options["early_stop"] > 0 or
+                               options["detect_cycles"]):
+        return
+    total = num_instances * options["duration"] / INTERVAL
+    print("Stopped early: saved %.1f of %d simulated intervals (%.1f%%)." %
+          (saved, total, 100 * saved / total))
+
+
+def test_single_graph(graph_file, seed_list, algorithm, outdir,
+                      options=None):
+    file_list = ["seed-%d.%s" % (seed, log_extension(options))
+                    for seed in seed_list]
+    output_files = [os.path.join(outdir, f) for f in file_list]
+    saved = test_batch(graph_file, seed_list, algorithm, output_files,
+                       options)
+    report_saved(saved, len(seed_list), options)
     
     index_file = os.path.join(outdir, "index.txt")
     with open(index_file, "w") as fo:
         fo.write("\n".join(file_list) + "\n")
 
 
-def test_multiple_graphs_serial(graph_dir, seed_list, algorithm, outdir):
+def test_multiple_graphs_serial(graph_dir, seed_list, algorithm, outdir,
+                                options=None):
     in_index_file = os.path.join(graph_dir, "index.txt")
     with open(in_index_file) as fo:
         indices = [int(line) for line in fo]
     
+    extension = log_extension(options)
     file_list = [None for _ in range(len(indices) * len(seed_list))]
     cnt = 0
+    saved = 0
     for graph_id in indices:
         graph_file = os.path.join(graph_dir, str(graph_id) + ".txt")
         for seed in seed_list:
-            file_list[cnt] = "graph-%d-seed-%d.txt" % (graph_id, seed)
+            file_list[cnt] = "graph-%d-seed-%d.%s" % \
+                                (graph_id, seed, extension)
             output_file = os.path.join(outdir, file_list[cnt])
-            test_instance(graph_file, seed, algorithm, output_file)
+            saved += test_instance(graph_file, seed, algorithm, output_file,
+                                   options)
             cnt += 1
+    report_saved(saved, len(file_list), options)
     
     out_index_file = os.path.join(outdir, "index.txt")
     with open(out_index_file, "w") as fo:
         fo.write("\n".join(file_list) + "\n")
 
 
-def test_multiple_graphs(graph_dir, seed_list, algorithm, outdir):
+def test_task(task):
+    return test_batch(*task)
+
+
+def task_cost(task):
+    handle, seed_list = task[:2]
+    return handle.cost() * len(seed_list)
+
+
+def seed_chunks(seed_list, chunk_size):
+    return [seed_list[i:i + chunk_size]
+                for i in range(0, len(seed_list), chunk_size)]
+
+
+def auto_seed_chunk(num_graphs, num_seeds, workers):
+    """ auto_seed_chunk picks how many seeds of a graph go in one task, so
+        that the pool gets TASKS_PER_WORKER tasks per worker if there are
+        enough seeds, and no task holds more than MAX_SEED_CHUNK seeds.
+    """
+    num_tasks = workers * TASKS_PER_WORKER
+    chunks_per_graph = -(-num_tasks // num_graphs)
+    return max(1, min(MAX_SEED_CHUNK, -(-num_seeds // chunks_per_graph)))
+
+
+def test_multiple_graphs(graph_dir, seed_list, algorithm, outdir,
+                         options=None):
     index_file = os.path.join(graph_dir, "index.txt")
     with open(index_file) as fo:
         indices = [int(line) for line in fo]
     
-    results = []
-    with mp.Pool(processes=8) as pool:
-        file_list = [None for _ in range(len(indices) * len(seed_list))]
-        cnt = 0
-        for graph_id in indices:
-            graph_file = os.path.join(graph_dir, str(graph_id) + ".txt")
-            for seed in seed_list:
-                file_list[cnt] = "graph-%d-seed-%d.txt" % (graph_id, seed)
-                output_file = os.path.join(outdir, file_list[cnt])
-                args = (graph_file, seed, algorithm, output_file,)
-                results.append(pool.apply_async(test_instance, args))
-                cnt += 1
-        
-        for res in results:
-            res.get()
+    if options is None:
+        options = DEFAULT_OPTIONS
+
+    extension = log_extension(options)
+    workers = options["workers"] or parallel.cpu_workers()
+    chunk_size = options["seed_chunk"]
+    if chunk_size == 0 and options["engine"] == "event":
+        chunk_size = auto_seed_chunk(len(indices), len(seed_list), workers)
+    elif chunk_size == 0:
+        chunk_size = len(seed_list)
+
+    graph_files = [os.path.join(graph_dir, str(graph_id) + ".txt")
+                      for graph_id in indices]
+    with graphstore.GraphStore(graphutils.read_graph(f)
+                                   for f in graph_files) as store:
+        tasks = []
+        file_list = []
+        for graph_id, handle in zip(indices, store.handles):
+            for chunk in seed_chunks(seed_list, chunk_size):
+                names = ["graph-%d-seed-%d.%s" % (graph_id, seed, extension)
+                            for seed in chunk]
+                file_list += names
+                output_files = [os.path.join(outdir, f) for f in names]
+                tasks.append((handle, chunk, algorithm, output_files,
+                              options,))
+
+        saved = sum(result for _, result in
+                        parallel.stream(test_task, tasks, workers,
+                                        options["chunksize"], task_cost))
+    report_saved(saved, len(file_list), options)
 
     out_index_file = os.path.join(outdir, "index.txt")
     with open(out_index_file, "w") as fo:
@@ -143,11 +504,92 @@ if __name__ == "__main__":
     parser.add_argument("--outdir", required=True,
                         help="output directory")
     parser.add_argument("--algo", required=True, 
-                        choices=["sleepwell", "solo", "solo2", "desync"],
+                        choices=sorted(ALGORITHMS),
                         help="string indicating the algorithm")
     parser.add_argument("--alpha", type=int,
                         help="alpha parameter for solo, solo2, desync " +
                              "(0 < a < 100)")
+    parser.add_argument("--engine", default="event",
+                        choices=["event", "numpy"],
+                        help="event-driven simulator or lockstep NumPy " +
+                             "engine batching all seeds of a graph " +
+                             "(default: event)")
+    parser.add_argument("--no-path-vector", action="store_true",
+                        help="Flag to disable path vector loop detection " +
+                             "of solo2")
+    parser.add_argument("--no-clamping", action="store_true",
+                        help="Flag to disable clamping to the successor " +
+                             "of solo2")
+    parser.add_argument("--seed-chunk", type=int, default=0, metavar="K",
+                        help="seeds of a graph simulated by one pool task " +
+                             "with --graph-dir (default: 0, chosen from " +
+                             "the number of graphs and seeds, or all seeds " +
+                             "with --engine numpy)")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="worker processes with --graph-dir " +
+                             "(default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=1,
+                        help="tasks sent to a worker at a time " +
+                             "(default: 1)")
+    parser.add_argument("--components", action="store_true",
+                        help="Flag to simulate each connected component " +
+                             "on its own event queue, large ones in " +
+                             "parallel")
+    parser.add_argument("--partitions", type=int, default=0, metavar="P",
+                        help="split the graph into P parts simulated by " +
+                             "parallel processes, for large graphs with " +
+                             "--algo sleepwell (default: 0, disabled)")
+    parser.add_argument("--scheduler", default="heap",
+                        choices=sorted(pq.SCHEDULERS),
+                        help="event queue implementation (default: heap)")
+    parser.add_argument("--fanout", action="store_true",
+                        help="Flag to schedule one event per broadcast " +
+                             "instead of one per neighbor")
+    parser.add_argument("--compact-ratio", type=float,
+                        default=pq.COMPACT_RATIO,
+                        help="fraction of dead queue entries that triggers " +
+                             "compaction (default: %.1f)" % pq.COMPACT_RATIO)
+    parser.add_argument("--early-stop", type=int, default=0, metavar="K",
+                        help="stop once every node has broadcast every " +
+                             "INTERVAL for K intervals and log the " +
+                             "converge time (default: 0, disabled)")
+    parser.add_argument("--duration", type=int,
+                        default=SIMULATION_DURATION // INTERVAL,
+                        help="simulated time in intervals (default: %d)" %
+                             (SIMULATION_DURATION // INTERVAL))
+    parser.add_argument("--log-tail", type=int, default=0, metavar="K",
+                        help="keep only the last K events of each node " +
+                             "between flushes (default: 0, keep all)")
+    parser.add_argument("--flush-interval", type=int, default=0,
+                        metavar="M",
+                        help="write events to disk every M intervals " +
+                             "(default: 0, at the end)")
+    parser.add_argument("--log-format", default="text",
+                        choices=["text", "binary"],
+                        help="text lines or fixed-width binary records " +
+                             "read by analyze.py (default: text)")
+    parser.add_argument("--run-length", action="store_true",
+                        help="Flag to collapse runs of broadcasts every " +
+                             "INTERVAL into one periodic record")
+    parser.add_argument("--rng", default="node", choices=RNG_MODES,
+                        help="random streams of each node, drawn per " +
+                             "seed and group of node ids, or the global " +
+                             "RNG, which " +
+                             "reproduces logs of earlier versions " +
+                             "(default: node)")
+    parser.add_argument("--summary", action="store_true",
+                        help="Flag to compute metrics during the " +
+                             "simulation and log a summary per instance")
+    parser.add_argument("--log-events", metavar="KINDS",
+                        help="comma-separated event kinds to log among " +
+                             "%s (default: all)" % ",".join(LOG_EVENTS))
+    parser.add_argument("--no-log", action="store_true",
+                        help="Flag to log no events and keep only the " +
+                             "summary (requires --summary)")
+    parser.add_argument("--detect-cycles", action="store_true",
+                        help="Flag to stop once offsets repeat with a " +
+                             "period of 2 or more intervals, or a node " +
+                             "resets twice, and log the period")
 
     args = parser.parse_args()
     
@@ -162,6 +604,69 @@ if __name__ == "__main__":
     elif args.graph_dir is not None and not os.path.isdir(args.graph_dir):
         parser.error("./%s is not a directory." % args.graph)
 
+    if args.engine == "numpy" and args.algo not in lockstep.ENGINES:
+        parser.error("--engine numpy supports --algo %s." %
+                     ", ".join(sorted(lockstep.ENGINES)))
+    if args.early_stop < 0:
+        parser.error("--early-stop should not be negative.")
+    if args.engine == "numpy" and (args.early_stop > 0 or
+                                   args.detect_cycles or args.summary):
+        parser.error("--early-stop, --detect-cycles and --summary are " +
+                     "only used with --engine event.")
+    if args.engine == "numpy" and (args.scheduler != "heap" or args.fanout or
+                                   args.compact_ratio != pq.COMPACT_RATIO or
+                                   args.log_tail > 0 or
+                                   args.flush_interval > 0):
+        parser.error("--scheduler, --fanout, --compact-ratio, --log-tail " +
+                     "and --flush-interval are only used with " +
+                     "--engine event.")
+    if args.components and (args.engine != "event" or
+                            args.rng != "node"):
+        parser.error("--components requires --engine event and " +
+                     "--rng node.")
+    if args.components and (args.early_stop > 0 or args.detect_cycles or
+                            args.log_tail > 0 or args.flush_interval > 0):
+        parser.error("--components is not used with --early-stop, " +
+                     "--detect-cycles, --log-tail or --flush-interval.")
+    if args.partitions > 1 and (args.algo != "sleepwell" or
+                                args.engine != "event" or
+                                args.rng != "node"):
+        parser.error("--partitions requires --algo sleepwell, " +
+                     "--engine event and --rng node.")
+    if args.partitions > 1 and (args.components or args.summary or
+                                args.fanout or args.early_stop > 0 or
+                                args.detect_cycles or args.log_tail > 0 or
+                                args.flush_interval > 0):
+        parser.error("--partitions is not used with --components, " +
+                     "--summary, --fanout, --early-stop, --detect-cycles, " +
+                     "--log-tail or --flush-interval.")
+    if args.partitions < 0:
+        parser.error("--partitions should not be negative.")
+    if args.no_log and not args.summary:
+        parser.error("--no-log requires --summary.")
+    if args.seed_chunk < 0:
+        parser.error("--seed-chunk should not be negative.")
+    if (args.workers is not None and args.workers <= 0) or \
+            args.chunksize <= 0:
+        parser.error("--workers and --chunksize should be positive.")
+    if args.duration <= 0:
+        parser.error("--duration should be positive.")
+    if args.log_tail < 0 or args.flush_interval < 0:
+        parser.error("--log-tail and --flush-interval should not be " +
+                     "negative.")
+    if args.no_log and args.log_events is not None:
+        parser.error("--no-log and --log-events are exclusive.")
+
+    log_events = None
+    if args.no_log:
+        log_events = []
+    elif args.log_events is not None:
+        log_events = args.log_events.split(",")
+        for kind in log_events:
+            if kind not in LOG_EVENTS:
+                parser.error("--log-events takes kinds among %s." %
+                             ",".join(LOG_EVENTS))
+
     if args.algo in ["solo", "solo2", "desync"] and args.alpha is None:
         parser.error("%s needs --alpha." % args.algo)
     elif args.algo == "sleepwell" and args.alpha is not None:
@@ -182,10 +687,29 @@ if __name__ == "__main__":
     if args.alpha is not None:
         algo["alpha"] = args.alpha
 
+    options = make_options(engine=args.engine, scheduler=args.scheduler,
+                           fanout=args.fanout,
+                           compact_ratio=args.compact_ratio,
+                           path_vector=not args.no_path_vector,
+                           clamping=not args.no_clamping,
+                           early_stop=args.early_stop,
+                           detect_cycles=args.detect_cycles,
+                           summary=args.summary, log_events=log_events,
+                           log_format=args.log_format,
+                           duration=args.duration * INTERVAL,
+                           log_tail=args.log_tail,
+                           flush_interval=args.flush_interval,
+                           run_length=args.run_length, rng=args.rng,
+                           seed_chunk=args.seed_chunk, workers=args.workers,
+                           chunksize=args.chunksize,
+                           components=args.components,
+                           partitions=args.partitions)
+
     if args.graph_dir is not None:
-        test_multiple_graphs(args.graph_dir, seed_list, algo, args.outdir)
+        test_multiple_graphs(args.graph_dir, seed_list, algo, args.outdir,
+                             options)
     else:
-        test_single_graph(args.graph, seed_list, algo, args.outdir)
+        test_single_graph(args.graph, seed_list, algo, args.outdir, options)
             
 
     
@@ -0,0 +1,158 @@
+import numpy as np
+from constants import INTERVAL
+
+
+class Observer(object):
+    """ Observer is notified by the nodes as a simulation runs.
+        1. broadcast, deficit and reset are called when a node logs the
+           event of the same name.
+        2. summary returns a dict from record kinds to either a dict from
+           node ids to values, or a single value for the whole instance.
+    """
+    def broadcast(self, node_id, now):
+        pass
+
+    def deficit(self, node_id, now, deficit):
+        pass
+
+    def reset(self, node_id, now):
+        pass
+
+    def summary(self, now):
+        return {}
+
+
+class ObserverGroup(Observer):
+    def __init__(self, observers):
+        self.observers = observers
+
+    def broadcast(self, node_id, now):
+        for observer in self.observers:
+            observer.broadcast(node_id, now)
+
+    def deficit(self, node_id, now, deficit):
+        for observer in self.observers:
+            observer.deficit(node_id, now, deficit)
+
+    def reset(self, node_id, now):
+        for observer in self.observers:
+            observer.reset(node_id, now)
+
+    def summary(self, now):
+        summary = {}
+        for observer in self.observers:
+            summary.update(observer.summary(now))
+        return summary
+
+
+class FinalOffsets(Observer):
+    """ FinalOffsets keeps the offset of the last broadcast of each node, as
+        analyze.examine_final_offsets.
+    """
+    def __init__(self, graph):
+        self.offsets = [None] * len(graph)
+
+    def broadcast(self, node_id, now):
+        self.offsets[node_id] = now % INTERVAL
+
+    def summary(self, now):
+        return {"offset": dict(enumerate(self.offsets))}
+
+
+class BroadcastCount(Observer):
+    """ BroadcastCount counts the broadcasts of each node, as
+        analyze.examine_min_broadcast_count.
+    """
+    def __init__(self, graph):
+        self.counts = [0] * len(graph)
+
+    def broadcast(self, node_id, now):
+        self.counts[node_id] += 1
+
+    def summary(self, now):
+        return {"count": dict(enumerate(self.counts))}
+
+
+class LastDeficit(Observer):
+    """ LastDeficit keeps the deficit each node reported last, as
+        analyze.examine_last_deficit.
+    """
+    def __init__(self, graph):
+        self.deficits = {}
+
+    def deficit(self, node_id, now, deficit):
+        self.deficits[node_id] = deficit
+
+    def summary(self, now):
+        return {"last-deficit": dict(self.deficits)}
+
+
+class TargetSeparation(FinalOffsets):
+    """ TargetSeparation is the smallest relative surplus of the share of a
+        node over its target share at the final offsets, as
+        analyze2.examine_target_separation.
+    """
+    def __init__(self, graph):
+        super().__init__(graph)
+        self.neighbors = [list(graph.neighbors(i)) for i in range(len(graph))]
+
+    def summary(self, now):
+        surplus = []
+        for node_id, peers in enumerate(self.neighbors):
+            if len(peers) == 0 or self.offsets[node_id] is None or \
+                    None in [self.offsets[i] for i in peers]:
+                continue
+            peers = np.array([self.offsets[i] for i in peers])
+            diffs = np.remainder(peers + INTERVAL - self.offsets[node_id],
+                                 INTERVAL)
+            target = INTERVAL // (len(peers) + 1)
+            surplus.append((np.amin(diffs) - target) / target)
+        separation = float(min(surplus)) if surplus else None
+        return {"separation": separation}
+
+
+METRICS = {"offset": FinalOffsets, "count": BroadcastCount,
+           "last-deficit": LastDeficit, "separation": TargetSeparation}
+
+
+def summary_records(summary, now):
+    records = []
+    for kind in sorted(summary):
+        value = summary[kind]
+        if isinstance(value, dict):
+            records += [(now, i, kind, v) for i, v in sorted(value.items())]
+        else:
+            records.append((now, -1, kind, value))
+    return records
+
+
+MERGES = {"converge": max, "separation": min}
+
+
+def relabel_summary(summary, labels):
+    """ relabel_summary replaces node i by labels[i] in the per-node
+        values of summary.
+    """
+    if summary is None:
+        return None
+    return {kind: {labels[i]: v for i, v in value.items()}
+                      if isinstance(value, dict) else value
+                for kind, value in summary.items()}
+
+
+def merge_summaries(summaries):
+    """ merge_summaries combines the summaries of disjoint parts of a graph
+        into the summary of the whole graph. Per-node values are united and
+        instance-wide values are combined by MERGES, ignoring None.
+    """
+    merged = {}
+    for kind in summaries[0]:
+        values = [summary[kind] for summary in summaries]
+        if isinstance(values[0], dict):
+            merged[kind] = {}
+            for value in values:
+                merged[kind].update(value)
+        else:
+            values = [v for v in values if v is not None]
+            merged[kind] = MERGES[kind](values) if values else None
+    return merged
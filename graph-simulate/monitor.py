@@ -0,0 +1,132 @@
+import collections
+import numpy as np
+from metrics import Observer
+from constants import INTERVAL, SIMULATION_DURATION
+
+TOLERANCE = 1e-6 * INTERVAL
+CYCLE_TOLERANCE = 1e-3 * INTERVAL
+MAX_PERIOD = 10
+CYCLE_REPEATS = 2
+
+
+class ConvergenceMonitor(Observer):
+    """ ConvergenceMonitor follows the broadcasts of every node during a
+        simulation and tells when all nodes have settled.
+        1. A gap between two consecutive broadcasts of a node is good if it
+           differs from INTERVAL by at most TOLERANCE, the same test
+           analyze.examine_converge_time applies to a finished log.
+        2. A node is stable once its last stable_intervals gaps are good.
+           Its converge time is the broadcast that ended its last bad gap,
+           or its second broadcast if no gap was bad.
+        3. The monitor is stable once every node is stable. Its converge
+           time is the latest converge time among the nodes.
+        4. With detect_cycles, the offsets of all nodes relative to node 0
+           are taken at every multiple of INTERVAL. If they are not fixed
+           but repeat within CYCLE_TOLERANCE with a period of at most
+           MAX_PERIOD intervals for CYCLE_REPEATS periods, the monitor
+           reports a cycle of that period.
+        5. With detect_cycles, a node that resets its offset for the second
+           time is also a cycle, whose period is the time between the resets.
+        6. Without early stop, the converge time is that of the whole run.
+           It is inf if a node did not broadcast in the last INTERVAL or its
+           last gap is bad.
+    """
+    def __init__(self, num_nodes, stable_intervals=0, detect_cycles=False,
+                 duration=SIMULATION_DURATION):
+        self.stable_intervals = stable_intervals
+        self.duration = duration
+        self.detect_cycles = detect_cycles
+        self.latest_broadcast = [None] * num_nodes
+        self.converge_time = [None] * num_nodes
+        self.good_count = [0] * num_nodes
+        self.num_unstable = num_nodes
+        self.stable = False
+        self.cycle = None
+
+        self.latest_reset = [None] * num_nodes
+        self.boundary = INTERVAL
+        self.snapshots = collections.deque(
+                                maxlen=CYCLE_REPEATS * MAX_PERIOD + 1)
+
+    @property
+    def done(self):
+        return self.stable or self.cycle is not None
+
+    def broadcast(self, node_id, now):
+        if self.detect_cycles:
+            while now >= self.boundary:
+                self.take_snapshot()
+                self.boundary += INTERVAL
+
+        latest = self.latest_broadcast[node_id]
+        self.latest_broadcast[node_id] = now
+        if latest is None:
+            return
+
+        was_stable = self.good_count[node_id] >= self.stable_intervals
+        if abs(now - latest - INTERVAL) > TOLERANCE:
+            self.good_count[node_id] = 0
+            self.converge_time[node_id] = now
+        else:
+            self.good_count[node_id] += 1
+            if self.converge_time[node_id] is None:
+                self.converge_time[node_id] = now
+        is_stable = self.good_count[node_id] >= self.stable_intervals
+
+        if self.stable_intervals == 0:
+            return
+        if was_stable and not is_stable:
+            self.num_unstable += 1
+        elif is_stable and not was_stable:
+            self.num_unstable -= 1
+        self.stable = self.num_unstable == 0
+
+    def reset(self, node_id, now):
+        if not self.detect_cycles:
+            return
+        latest = self.latest_reset[node_id]
+        self.latest_reset[node_id] = now
+        if latest is not None:
+            self.cycle = max(round((now - latest) / INTERVAL), 1)
+
+    def take_snapshot(self):
+        if None in self.latest_broadcast:
+            self.snapshots.clear()
+            return
+        offsets = np.array(self.latest_broadcast) % INTERVAL
+        self.snapshots.append((offsets - offsets[0]) % INTERVAL)
+
+        period = self.find_period()
+        if period is not None and period > 1:
+            self.cycle = period
+
+    def find_period(self):
+        history = list(self.snapshots)
+        for period in range(1, MAX_PERIOD + 1):
+            if len(history) <= CYCLE_REPEATS * period:
+                return None
+            if all(self.same(history[-1 - i * period],
+                             history[-1 - (i + 1) * period])
+                       for i in range(CYCLE_REPEATS)):
+                return period
+        return None
+
+    def same(self, a, b):
+        distance = np.abs(a - b)
+        distance = np.minimum(distance, INTERVAL - distance)
+        return distance.max() <= CYCLE_TOLERANCE
+
+    def converge(self, now):
+        if self.stable:
+            return max(self.converge_time)
+        end = min(now, self.duration)
+        for latest, good_count in zip(self.latest_broadcast,
+                                      self.good_count):
+            if latest is None or latest < end - INTERVAL or good_count == 0:
+                return float("inf")
+        return max(self.converge_time)
+
+    def summary(self, now):
+        if self.cycle is not None:
+            return {"cycle": self.cycle}
+        return {"converge": self.converge(now)}
@@ -0,0 +1,159 @@
+import array
+import bisect
+from constants import INTERVAL
+
+
+class NeighborMap(object):
+    """ NeighborMap keeps the latest offset heard from every neighbor of a
+        node, indexed by the local slot of the neighbor in the links of the
+        node.
+        1. Offsets are stored in an array of 64-bit integers, with -1 for a
+           neighbor that has not been heard yet.
+        2. It reads as the dict it replaces: len is the number of neighbors
+           heard so far and values returns their offsets, in sorted order.
+    """
+    __slots__ = ("offsets", "heard")
+
+    def __init__(self, size):
+        self.offsets = array.array("q", [-1]) * size
+        self.heard = 0
+
+    def __len__(self):
+        return self.heard
+
+    def __getitem__(self, slot):
+        return self.offsets[slot]
+
+    def __setitem__(self, slot, offset):
+        if self.offsets[slot] < 0:
+            self.heard += 1
+        self.offsets[slot] = offset
+
+    def values(self):
+        offsets = sorted(self.offsets)
+        return offsets[bisect.bisect_left(offsets, 0):]
+
+
+class SortedNeighborMap(NeighborMap):
+    """ SortedNeighborMap is a NeighborMap that can also find the successor
+        of an offset among the offsets heard, modulo INTERVAL.
+        1. The offsets heard are also kept sorted on the circle: a reception
+           removes the previous offset of its neighbor, if any, and inserts
+           the new one in place, so the order is never sorted again.
+        2. successor returns the first offset at or after the given one,
+           wrapping around to the smallest.
+    """
+    __slots__ = ("circle",)
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.circle = []
+
+    def __setitem__(self, slot, offset):
+        circle = self.circle
+        previous = self.offsets[slot]
+        if previous >= 0:
+            del circle[bisect.bisect_left(circle, previous % INTERVAL)]
+        super().__setitem__(slot, offset)
+        bisect.insort(circle, offset % INTERVAL)
+
+    def successor(self, offset):
+        circle = self.circle
+        return circle[bisect.bisect_left(circle, offset) % len(circle)]
+
+
+class Node(object):
+    """ Node holds the state shared by the nodes of every algorithm.
+        1. links holds the ids of the neighbors and slots the slot of the
+           node in the links of each neighbor, both as arrays of integers.
+           nodes is the list of all nodes, shared by every node.
+        2. A beacon is sent to a neighbor as a call of its recv_callback with
+           the slot of the sender first, so that the neighbor can update its
+           neighbor_map without looking the sender up.
+        3. With fanout, a beacon is a single event that calls every
+           neighbor, instead of one event per neighbor.
+        4. neighbor_map is an instance of Map, which a subclass may replace.
+        5. stream gives the jitter and reset offsets of the node. Subclasses
+           set a streams.LegacyStream, which the simulator may replace with
+           a streams.NodeStream.
+    """
+    __slots__ = ("node_id", "pq", "observer", "neighbor_map", "links",
+                 "slots", "nodes", "stream", "on", "timer", "latest_broadcast",
+                 "log")
+    Map = NeighborMap
+
+    def __init__(self, node_id, pq):
+        self.node_id = node_id
+        self.pq = pq
+        self.observer = None
+        self.neighbor_map = NeighborMap(0)
+        self.links = array.array("i")
+        self.slots = array.array("i")
+        self.nodes = None
+        self.stream = None
+
+        # State
+        self.on = False
+        self.timer = None
+        self.latest_broadcast = None
+
+        # Logging related
+        self.log = []
+
+
+    def set_links(self, nodes, links, slots):
+        self.nodes = nodes
+        self.links = array.array("i", links)
+        self.slots = array.array("i", slots)
+        self.neighbor_map = self.Map(len(links))
+
+
+    def now(self):
+        return self.pq.current
+
+
+    def send(self, args, fanout):
+        now = self.pq.current
+        if fanout:
+            if self.links:
+                self.pq.add_task((self.deliver, args), now)
+        else:
+            nodes = self.nodes
+            for neighbor, slot in zip(self.links, self.slots):
+                self.pq.add_task((nodes[neighbor].recv_callback,
+                                  (slot,) + args), now)
+
+
+    def deliver(self, *args):
+        nodes = self.nodes
+        for neighbor, slot in zip(self.links, self.slots):
+            nodes[neighbor].recv_callback(slot, *args)
+
+
+def logged_kinds(kinds, log_events=None):
+    """ logged_kinds returns the record kinds among kinds that are logged
+        for the log_events option: all of them if it is None, none if it is
+        empty, and init with the kinds it lists otherwise.
+    """
+    if log_events is None:
+        return frozenset(kinds)
+    if log_events:
+        return frozenset(["init"] + list(log_events))
+    return frozenset()
+
+
+def connect(node_list, graph, labels=None):
+    """ connect links every node of node_list to its neighbors in graph, in
+        the order of graph.neighbors. Node i of node_list stands for node
+        labels[i] of graph, or node i if labels is None, and labels must
+        hold every neighbor of its nodes.
+    """
+    if labels is None:
+        labels = range(len(node_list))
+    index = {label: i for i, label in enumerate(labels)}
+    neighbors = [[index[j] for j in graph.neighbors(label)]
+                    for label in labels]
+    slots = [{j: slot for slot, j in enumerate(links)} for links in neighbors]
+    for i, node in enumerate(node_list):
+        node.set_links(node_list, neighbors[i],
+                       [slots[j][i] for j in neighbors[i]])
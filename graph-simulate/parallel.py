@@ -0,0 +1,75 @@
+import multiprocessing as mp
+import os
+
+"""
+The parallel module runs the jobs of a sweep in a pool of worker processes,
+for the simulator, the analysis and the event detection scripts alike.
+
+Jobs are submitted longest first by an estimated cost, so the largest
+graphs of a sweep start early instead of straggling at the end, and results
+are streamed back as workers finish them. With a single worker, jobs run in
+the calling process without a pool.
+"""
+
+
+def cpu_workers():
+    return os.cpu_count() or 1
+
+
+def file_cost(path):
+    """ file_cost estimates the cost of a job by the size of its input file,
+        which grows with the edges of a graph or the records of a log.
+    """
+    return os.path.getsize(path)
+
+
+class Indexed(object):
+    """ Indexed calls func on a job and returns the result with the index
+        of the job, so that results received out of order can be placed.
+    """
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, indexed_job):
+        index, job = indexed_job
+        return index, self.func(job)
+
+
+def stream(func, jobs, workers=None, chunksize=1, cost=None):
+    """ stream calls func on every job of jobs and yields (index, result)
+        pairs in the order they complete.
+        1. workers is the number of processes, all CPUs if None.
+        2. chunksize jobs are sent to a worker at a time.
+        3. If cost is given, jobs are submitted in decreasing cost(job).
+        4. In a pool worker, which cannot start a pool, jobs run in the
+           worker itself.
+    """
+    jobs = list(jobs)
+    order = list(range(len(jobs)))
+    if cost is not None:
+        costs = [cost(job) for job in jobs]
+        order.sort(key=costs.__getitem__, reverse=True)
+    if workers is None:
+        workers = cpu_workers()
+    if mp.current_process().daemon:
+        workers = 1
+    workers = max(1, min(workers, len(jobs)))
+
+    if workers == 1:
+        for index in order:
+            yield index, func(jobs[index])
+        return
+
+    with mp.Pool(processes=workers) as pool:
+        yield from pool.imap_unordered(Indexed(func),
+                                       [(i, jobs[i]) for i in order],
+                                       chunksize)
+
+
+def run(func, jobs, workers=None, chunksize=1, cost=None):
+    """ run is stream with the results returned in the order of jobs. """
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    for index, result in stream(func, jobs, workers, chunksize, cost):
+        results[index] = result
+    return results
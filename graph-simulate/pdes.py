@@ -0,0 +1,277 @@
+import array
+import multiprocessing as mp
+import queue
+import traceback
+import networkx as nx
+import pqueue as pq
+import graphstore
+import sleepwell
+from streams import SeedStreams
+from constants import INTERVAL
+
+POLL_INTERVAL = 1.0
+
+"""
+Conservative parallel simulation of SleepWell on a single graph. The nodes
+are split into parts, each simulated by its own process with its own event
+queue, and beacons between parts are exchanged once per window of
+simulated time.
+
+A SleepWell node only moves its timer when the timer fires, and never to
+less than INTERVAL // 2 + 1 - JITTER later. So every broadcast in a window
+[T, T + lookahead()) was already scheduled at T, and each part can announce
+the broadcasts of its boundary nodes for the whole window before running
+it. Beacons have no delay, so this scheduling lookahead is the only one
+there is, and the other algorithms, which move timers on receptions, have
+none.
+
+Nodes keep the random streams of streams.SeedStreams, so a partitioned run
+matches the event simulator with rng "node". Fanout is not supported, as a
+beacon heard in several parts would be counted as several events. At equal
+times, receptions of beacons from other parts are taken before those from
+the same part, which only matters when two beacons reach a node at the
+very same time.
+"""
+
+
+def lookahead():
+    return INTERVAL // 2 + 1 - sleepwell.JITTER
+
+
+def partition(graph, num_parts):
+    """ partition splits the nodes of graph into at most num_parts parts of
+        consecutive nodes in reverse Cuthill-McKee order, which keeps
+        neighbors close, so that a UDG is cut into bands with few edges
+        between them.
+    """
+    order = list(nx.utils.reverse_cuthill_mckee_ordering(
+                     graphstore.as_networkx(graph)))
+    size = -(-len(order) // num_parts)
+    return [sorted(order[i:i + size]) for i in range(0, len(order), size)]
+
+
+class Partition(object):
+    """ Partition simulates the nodes of one part of the graph.
+        1. Nodes keep their ids in the graph and their full neighbor maps,
+           but only send beacons to neighbors of the same part.
+        2. boundary lists, for every other part, the nodes of this part
+           that have neighbors in it, and targets lists, for every node of
+           another part, its neighbors in this part with the slot of the
+           node in their links.
+        3. The next broadcast of a node is its start until it starts, and
+           its timer after.
+    """
+    def __init__(self, graph, seed, parts, owner, index, options):
+        self.index = index
+        self.part = parts[index]
+        self.queue = pq.SCHEDULERS[options["scheduler"]](
+                        compact_ratio=options["compact_ratio"])
+        self.nodes = [None] * len(graph)
+        self.start = {}
+        self.events = 0
+
+        seed_streams = SeedStreams(seed, self.part, sleepwell.JITTER)
+        for i in self.part:
+            node = sleepwell.SleepWellNode(i, self.queue)
+            node.stream = seed_streams.stream(i)
+            self.start[i] = node.stream.offset()
+            self.nodes[i] = node
+
+        positions = {}
+        def slot(j, i):
+            if j not in positions:
+                positions[j] = {k: s for s, k in
+                                    enumerate(graph.neighbors(j))}
+            return positions[j][i]
+
+        self.boundary = {}
+        self.targets = {}
+        for i in self.part:
+            node = self.nodes[i]
+            links = list(graph.neighbors(i))
+            slots = [slot(j, i) for j in links]
+            node.set_links(self.nodes, links, slots)
+            local = [k for k, j in enumerate(links) if owner[j] == index]
+            node.links = array.array("i", [links[k] for k in local])
+            node.slots = array.array("i", [slots[k] for k in local])
+            for k, j in enumerate(links):
+                if owner[j] != index:
+                    self.boundary.setdefault(owner[j], set()).add(i)
+                    self.targets.setdefault(j, []).append((i, k))
+
+        for i in self.part:
+            self.queue.add_task((self.nodes[i].start, (None,)),
+                                self.start[i])
+
+    def next_broadcast(self, i):
+        node = self.nodes[i]
+        if node.on:
+            return node.timer.priority
+        return self.start[i]
+
+    def outgoing(self, end):
+        """ outgoing returns, for every neighbor part, the (time, node)
+            broadcasts its neighbors in this part make before end.
+        """
+        times = {i: self.next_broadcast(i)
+                    for nodes in self.boundary.values() for i in nodes}
+        return {other: sorted((times[i], i) for i in nodes
+                                  if times[i] < end)
+                    for other, nodes in self.boundary.items()}
+
+    def inject(self, broadcasts):
+        for now, src in sorted(broadcasts):
+            for i, slot in self.targets[src]:
+                self.queue.add_task((self.nodes[i].recv_callback,
+                                     (slot, src)), now)
+
+    def run(self, end):
+        queue = self.queue
+        while True:
+            now = queue.peek()
+            if now is None or now >= end:
+                return
+            func, argv = queue.pop_task()
+            func(*argv)
+            self.events += 1
+
+    def finish(self):
+        """ finish runs the first event at or past the duration, and
+            returns the logs of the part with what was held before it, as
+            main.simulate_component does.
+        """
+        logs = [self.nodes[i].log for i in self.part]
+        held = {"held_time": self.queue.peek(), "held_events": self.events,
+                "held_lengths": [len(log) for log in logs]}
+        func, argv = self.queue.pop_task()
+        func(*argv)
+        self.events += 1
+        held.update({"logs": logs, "events": self.events,
+                     "time": self.queue.current, "summary": None,
+                     "held_summary": None})
+        return held
+
+
+def windows(duration):
+    """ windows yields the (window, end) of every window up to duration. """
+    step = lookahead()
+    window = 0
+    start = 0
+    while start < duration:
+        end = min(start + step, duration)
+        yield window, end
+        start = end
+        window += 1
+
+
+def run_partition(graph, seed, parts, owner, index, options, inboxes,
+                  results):
+    """ run_partition runs one part window by window. At the start of a
+        window, the part sends its boundary broadcasts to every neighbor
+        part and waits for theirs. Messages are tagged with their window,
+        since a neighbor may already send the next one. If the part fails,
+        its traceback is sent in place of its result.
+    """
+    try:
+        part = Partition(graph, seed, parts, owner, index, options)
+        inbox = inboxes[index]
+        early = {}
+        for window, end in windows(options["duration"]):
+            for other, broadcasts in part.outgoing(end).items():
+                inboxes[other].put((window, broadcasts))
+
+            incoming = early.pop(window, [])
+            received = len(incoming)
+            while received < len(part.boundary):
+                tag, broadcasts = inbox.get()
+                if tag == window:
+                    incoming.append(broadcasts)
+                    received += 1
+                else:
+                    early.setdefault(tag, []).append(broadcasts)
+            part.inject([b for broadcasts in incoming for b in broadcasts])
+            part.run(end)
+        results.put((index, part.finish(), None))
+    except BaseException:
+        results.put((index, None, traceback.format_exc()))
+        raise
+
+
+def run_inline(graph, seed, parts, owner, options):
+    """ run_inline runs every part in this process, one window at a time,
+        for a caller that cannot start processes.
+    """
+    partitions = [Partition(graph, seed, parts, owner, index, options)
+                     for index in range(len(parts))]
+    for window, end in windows(options["duration"]):
+        outgoing = [part.outgoing(end) for part in partitions]
+        for part in partitions:
+            part.inject([b for sent in outgoing
+                             for b in sent.get(part.index, [])])
+            part.run(end)
+    return [part.finish() for part in partitions]
+
+
+def collect(processes, results):
+    """ collect returns the results of processes in order. If a process
+        fails, the others are stopped and its error is raised.
+    """
+    collected = {}
+    while len(collected) < len(processes):
+        try:
+            index, result, error = results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            for index, process in enumerate(processes):
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError("partition %d exited with code %d" %
+                                       (index, process.exitcode))
+            continue
+        if error is not None:
+            raise RuntimeError("partition %d failed:\n%s" % (index, error))
+        collected[index] = result
+    return [collected[index] for index in range(len(processes))]
+
+
+def simulate(graph, seed, options, num_parts):
+    """ simulate runs SleepWell on graph split into num_parts parts, each in
+        its own process, and returns the result of every part.
+        1. The node module must already be configured, as processes are
+           forked, and the graph is handed to them as a graphstore.CSRGraph,
+           whose arrays the processes share instead of copying the objects
+           of a NetworkX graph as they touch them.
+        2. In a daemonic process, such as a pool worker, which cannot start
+           processes, the parts run in the process itself.
+        3. If a part fails, the other parts are terminated and a
+           RuntimeError is raised with its traceback.
+    """
+    if options["fanout"]:
+        raise ValueError("pdes does not support fanout.")
+    parts = partition(graph, num_parts)
+    graph = graphstore.as_csr(graph)
+    owner = [0] * len(graph)
+    for index, part in enumerate(parts):
+        for i in part:
+            owner[i] = index
+    if mp.current_process().daemon:
+        return run_inline(graph, seed, parts, owner, options)
+
+    context = mp.get_context("fork")
+    inboxes = [context.Queue() for _ in parts]
+    results = context.Queue()
+    processes = [context.Process(target=run_partition,
+                                 args=(graph, seed, parts, owner, index,
+                                       options, inboxes, results))
+                    for index in range(len(parts))]
+    try:
+        for process in processes:
+            process.start()
+        return collect(processes, results)
+    except BaseException:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in processes:
+            if process.pid is not None:
+                process.join()
@@ -1,34 +1,302 @@
 #!/usr/bin/python3
 
+import collections
 import itertools
 import heapq
 
+COMPACT_RATIO = 0.5
+COMPACT_MIN_SIZE = 64
+
+class Timer(object):
+    """ Timer is a handle to a callback scheduled with schedule(). The handle
+        is reused by reschedule() and cancel(), so timers are never hashed
+        and a fired timer can be armed again without allocating a handle.
+    """
+    __slots__ = ("task", "priority", "count", "entry")
+
+    def __init__(self, task):
+        self.task = task
+        self.priority = None
+        self.count = None
+        self.entry = None
+
+    def pending(self):
+        return self.entry is not None
+
+
 class PriorityQueue(object):
+    """ PriorityQueue is a binary heap with lazy deletion.
+        1. Removed and rescheduled tasks leave a dead entry in the heap that
+           is skipped when it is popped.
+        2. When dead entries exceed compact_ratio of the heap, the heap is
+           rebuilt with live entries only. Pop order is not affected.
+        3. Timers returned by schedule() are moved by reschedule(). A timer
+           moved to a later time keeps its heap entry, which is pushed again
+           with the new time and insertion count when it surfaces.
+    """
     REMOVED = "<removed-task>"
 
-    def __init__(self):
+    def __init__(self, compact_ratio=COMPACT_RATIO):
         self.pq = []
         self.entry_finder = {}
         self.counter = itertools.count()
         self.current = 0
 
+        self.compact_ratio = compact_ratio
+        self.timers = 0
+        self.dead = 0
+        self.peak = 0
+        self.compactions = 0
+
+    def __len__(self):
+        return len(self.entry_finder) + self.timers
+
+    def push(self, entry):
+        heapq.heappush(self.pq, entry)
+        if len(self.pq) > self.peak:
+            self.peak = len(self.pq)
+
     def add_task(self, task, priority=0):
         if task in self.entry_finder:
             self.remove_task(task)
         count = next(self.counter)
         entry = [priority, count, task]
         self.entry_finder[task] = entry
-        heapq.heappush(self.pq, entry)
+        self.push(entry)
 
     def remove_task(self, task):
         entry = self.entry_finder.pop(task)
+        self.remove_entry(entry)
+
+    def remove_entry(self, entry):
         entry[-1] = self.REMOVED
+        self.dead += 1
+        if self.dead > self.compact_ratio * len(self.pq) and \
+                len(self.pq) >= COMPACT_MIN_SIZE:
+            self.compact()
+
+    def schedule(self, func, argv, priority=0):
+        timer = Timer((func, argv))
+        self.reschedule(timer, priority)
+        return timer
+
+    def reschedule(self, timer, priority):
+        count = next(self.counter)
+        entry = timer.entry
+        timer.priority = priority
+        timer.count = count
+        if entry is not None:
+            if priority >= entry[0]:
+                return
+            self.remove_entry(entry)
+        else:
+            self.timers += 1
+        timer.entry = [priority, count, timer]
+        self.push(timer.entry)
+
+    def cancel(self, timer):
+        if timer.entry is None:
+            raise KeyError("cancel of a timer that is not pending")
+        self.timers -= 1
+        self.remove_entry(timer.entry)
+        timer.entry = None
 
     def pop_task(self):
         while self.pq:
-            priority, count, task = heapq.heappop(self.pq)
-            if task is not self.REMOVED:
+            entry = heapq.heappop(self.pq)
+            priority, count, task = entry
+            if task is self.REMOVED:
+                self.dead -= 1
+            elif type(task) is Timer:
+                if task.count != count:
+                    entry[0] = task.priority
+                    entry[1] = task.count
+                    heapq.heappush(self.pq, entry)
+                    continue
+                self.timers -= 1
+                task.entry = None
+                self.current = priority
+                return task.task
+            else:
                 del self.entry_finder[task]
                 self.current = priority
                 return task
         raise KeyError("pop from an empty priority queue")
+
+    def peek(self):
+        """ peek returns the priority of the task pop_task would return, or
+            None if the queue is empty. Dead entries on top are dropped and
+            moved timers are pushed again, as pop_task would do.
+        """
+        while self.pq:
+            entry = self.pq[0]
+            priority, count, task = entry
+            if task is self.REMOVED:
+                heapq.heappop(self.pq)
+                self.dead -= 1
+            elif type(task) is Timer and task.count != count:
+                entry[0] = task.priority
+                entry[1] = task.count
+                heapq.heapreplace(self.pq, entry)
+            else:
+                return priority
+        return None
+
+    def compact(self):
+        self.pq = [e for e in self.pq if e[-1] is not self.REMOVED]
+        for entry in self.pq:
+            if type(entry[-1]) is Timer:
+                entry[0] = entry[-1].priority
+                entry[1] = entry[-1].count
+        heapq.heapify(self.pq)
+        self.dead = 0
+        self.compactions += 1
+
+    def stats(self):
+        return {"live": len(self), "dead": self.dead, "peak": self.peak,
+                "compactions": self.compactions}
+
+
+class CalendarQueue(object):
+    """ CalendarQueue is a drop-in replacement of PriorityQueue that buckets
+        entries by timestamp.
+        1. Entries with the same priority share one FIFO bucket. Since the
+           insertion count only grows, a bucket is already in (priority,
+           count) order and the pop order is identical to PriorityQueue.
+        2. Only distinct priorities are kept in a heap, so a broadcast that
+           schedules one entry per neighbor at the same time costs a single
+           heap operation. The other inserts and pops are O(1).
+        3. Dead entries are compacted the same way as PriorityQueue.
+        4. Timers are supported as in PriorityQueue, but a rescheduled timer
+           always moves to its new bucket. Appending to a bucket is O(1), and
+           deferring the move would break the count order within buckets.
+    """
+    REMOVED = "<removed-task>"
+
+    def __init__(self, compact_ratio=COMPACT_RATIO):
+        self.buckets = {}
+        self.days = []
+        self.entry_finder = {}
+        self.counter = itertools.count()
+        self.current = 0
+
+        self.compact_ratio = compact_ratio
+        self.timers = 0
+        self.size = 0
+        self.dead = 0
+        self.peak = 0
+        self.compactions = 0
+
+    def __len__(self):
+        return len(self.entry_finder) + self.timers
+
+    def add_task(self, task, priority=0):
+        if task in self.entry_finder:
+            self.remove_task(task)
+        count = next(self.counter)
+        entry = [priority, count, task]
+        self.entry_finder[task] = entry
+        self.push(entry)
+
+    def push(self, entry):
+        priority = entry[0]
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = collections.deque()
+            heapq.heappush(self.days, priority)
+        bucket.append(entry)
+        self.size += 1
+        if self.size > self.peak:
+            self.peak = self.size
+
+    def remove_task(self, task):
+        entry = self.entry_finder.pop(task)
+        self.remove_entry(entry)
+
+    def remove_entry(self, entry):
+        entry[-1] = self.REMOVED
+        self.dead += 1
+        if self.dead > self.compact_ratio * self.size and \
+                self.size >= COMPACT_MIN_SIZE:
+            self.compact()
+
+    def schedule(self, func, argv, priority=0):
+        timer = Timer((func, argv))
+        self.reschedule(timer, priority)
+        return timer
+
+    def reschedule(self, timer, priority):
+        if timer.entry is not None:
+            self.remove_entry(timer.entry)
+        else:
+            self.timers += 1
+        timer.priority = priority
+        timer.count = next(self.counter)
+        timer.entry = [priority, timer.count, timer]
+        self.push(timer.entry)
+
+    def cancel(self, timer):
+        if timer.entry is None:
+            raise KeyError("cancel of a timer that is not pending")
+        self.timers -= 1
+        self.remove_entry(timer.entry)
+        timer.entry = None
+
+    def pop_task(self):
+        while self.days:
+            priority = self.days[0]
+            bucket = self.buckets[priority]
+            while bucket:
+                task = bucket.popleft()[-1]
+                self.size -= 1
+                if task is self.REMOVED:
+                    self.dead -= 1
+                elif type(task) is Timer:
+                    self.timers -= 1
+                    task.entry = None
+                    self.current = priority
+                    return task.task
+                else:
+                    del self.entry_finder[task]
+                    self.current = priority
+                    return task
+            heapq.heappop(self.days)
+            del self.buckets[priority]
+        raise KeyError("pop from an empty priority queue")
+
+    def peek(self):
+        """ peek returns the priority of the task pop_task would return, or
+            None if the queue is empty. Dead entries on top are dropped.
+        """
+        while self.days:
+            priority = self.days[0]
+            bucket = self.buckets[priority]
+            while bucket:
+                if bucket[0][-1] is not self.REMOVED:
+                    return priority
+                bucket.popleft()
+                self.size -= 1
+                self.dead -= 1
+            heapq.heappop(self.days)
+            del self.buckets[priority]
+        return None
+
+    def compact(self):
+        buckets = {}
+        for priority, bucket in self.buckets.items():
+            live = [e for e in bucket if e[-1] is not self.REMOVED]
+            if live:
+                buckets[priority] = collections.deque(live)
+        self.buckets = buckets
+        self.days = list(buckets)
+        heapq.heapify(self.days)
+        self.size -= self.dead
+        self.dead = 0
+        self.compactions += 1
+
+    def stats(self):
+        return {"live": len(self), "dead": self.dead, "peak": self.peak,
+                "compactions": self.compactions}
+
+
+SCHEDULERS = {"heap": PriorityQueue, "calendar": CalendarQueue}
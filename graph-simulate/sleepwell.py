@@ -1,10 +1,18 @@
+import bisect
+import operator
 import random
+from node import Node
+from streams import LegacyStream
 from constants import INTERVAL
 
+CONFIG_FANOUT = False
+LOG_EVENTS = ["init", "broadcast", "deficit", "reset"]
+CONFIG_LOG_EVENTS = frozenset(LOG_EVENTS)
+
 MAX_DEFICIT_COUNT = 200
 JITTER = 10
 
-class SleepWellNode(object):
+class SleepWellNode(Node):
     """ SleepWellNode behaves in the following manner.
         1. When it starts, it broadcasts a beacon and reschedules a broadcast
            for INTERVAL after.
@@ -20,25 +28,19 @@ class SleepWellNode(object):
            set to random for the next beacon broadcast. The deficit count
            resets to 0.
     """
+    __slots__ = ("my_slot", "deficit_count")
+
     def __init__(self, node_id, pq):
-        self.node_id = node_id
-        self.pq = pq
-        self.neighbor_map = {}
-        self.links = set([])
+        super().__init__(node_id, pq)
+        self.stream = LegacyStream(random, JITTER)
 
         # State
-        self.on = False
         self.my_slot = False
-        self.latest_broadcast = None
         self.deficit_count = 0
         
         # Logging related
-        self.log = []
-        self.log.append((0, self.node_id, "init", "None"))
-
-
-    def set_links(self, node_list):
-        self.links = set(node_list)
+        if "init" in CONFIG_LOG_EVENTS:
+            self.log.append((0, self.node_id, "init", "None"))
 
 
     def start(self, aux):
@@ -47,37 +49,37 @@ class SleepWellNode(object):
         self.set_timer(INTERVAL)
 
 
-    def now(self):
-        return self.pq.current
-
-
     def close_slot(self):
         now = self.now()
         target_share = self.target_share()
         my_share = now - self.latest_broadcast
         deficit = (target_share - my_share) / target_share
-        self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if "deficit" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if self.observer is not None:
+            self.observer.deficit(self.node_id, now, deficit)
         self.my_slot = False
 
     
     def broadcast(self):
         now = self.now()
-        for neighbor in self.links:
-            task = (neighbor.recv_callback, (self.node_id,))
-            self.pq.add_task(task, now)
+        self.send((self.node_id,), CONFIG_FANOUT)
          
-        self.log.append((now, self.node_id, "broadcast", "None"))
+        if "broadcast" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "broadcast", "None"))
+        if self.observer is not None:
+            self.observer.broadcast(self.node_id, now)
         if self.my_slot:
             self.close_slot()
         self.my_slot = True
         self.latest_broadcast = now
 
 
-    def recv_callback(self, src):
+    def recv_callback(self, slot, src):
         if not self.on:
             return
             
-        self.neighbor_map[src] = self.now() % INTERVAL
+        self.neighbor_map[slot] = self.now() % INTERVAL
 
         if self.my_slot:
             self.close_slot()
@@ -90,9 +92,12 @@ class SleepWellNode(object):
 
 
     def set_timer(self, interval):
-        task = (self.timer_callback, (None,))
-        interval += random.randint(-JITTER, JITTER)
-        self.pq.add_task(task,  self.now() + interval)
+        interval += self.stream.jitter()
+        if self.timer is None:
+            self.timer = self.pq.schedule(self.timer_callback, (None,),
+                                          self.now() + interval)
+        else:
+            self.pq.reschedule(self.timer, self.now() + interval)
 
 
     def adjust(self):
@@ -102,19 +107,24 @@ class SleepWellNode(object):
         if len(self.neighbor_map) == 0:
             return INTERVAL
 
-        nmap_offsets = self.neighbor_map.values()
-        my_share = min([self.diff(o, my_offset) for o in nmap_offsets])
+        offsets = self.neighbor_map.values()
+        successor = offsets[bisect.bisect_left(offsets, my_offset) %
+                            len(offsets)]
+        my_share = self.diff(successor, my_offset)
         target_share = self.target_share()
         if my_share - target_share > -1e-3 * INTERVAL:
             return INTERVAL
 
         self.deficit_count += 1
         if self.deficit_count == MAX_DEFICIT_COUNT:
-            new_offset = random.randint(0, INTERVAL - 1)
+            new_offset = self.stream.offset()
             self.deficit_count = 0
-            self.log.append((now, self.node_id, "reset", "None"))
+            if "reset" in CONFIG_LOG_EVENTS:
+                self.log.append((now, self.node_id, "reset", "None"))
+            if self.observer is not None:
+                self.observer.reset(self.node_id, now)
         else: 
-            start, end = self.largest_gap()
+            start, end = self.largest_gap(offsets)
             half_gap = self.diff(end, start) // 2
             if half_gap > target_share:
                 new_offset = self.sum(start, half_gap)
@@ -132,12 +142,14 @@ class SleepWellNode(object):
         return INTERVAL // (len(self.neighbor_map) + 1)
     
 
-    def largest_gap(self):
-        starts = sorted(self.neighbor_map.values())
-        ends = starts[1:] + [starts[0]]
-        gaps = [self.diff(e, s) for s, e in zip(starts, ends)]
-        index = max(range(len(gaps)), key=gaps.__getitem__)
-        return starts[index], ends[index]
+    def largest_gap(self, starts):
+        """ largest_gap returns the ends of the largest gap between the
+            sorted offsets starts, on the circle.
+        """
+        gaps = list(map(operator.sub, starts[1:] + [starts[0] + INTERVAL],
+                        starts))
+        index = gaps.index(max(gaps))
+        return starts[index], starts[(index + 1) % len(starts)]
 
     
     def sum(self, a, b):
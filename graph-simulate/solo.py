@@ -1,10 +1,16 @@
 import random
+from node import Node
+from streams import LegacyStream
 from constants import INTERVAL
 
+CONFIG_FANOUT = False
+LOG_EVENTS = ["init", "broadcast", "deficit"]
+CONFIG_LOG_EVENTS = frozenset(LOG_EVENTS)
+
 JITTER = 10
 ALPHA = 50
 
-class SoloNode(object):
+class SoloNode(Node):
     """ Solo Node behaves in the following manner.
         1. When it starts, it broadcasts a beacon and reschedules a broadcast
            for INTERVAL after.
@@ -17,26 +23,19 @@ class SoloNode(object):
            has a deficit, the node (the receiver) reschedules the pending
            broadcast with a delay between 0 and INTERVAL/2.
     """
+    __slots__ = ("my_slot", "next_broadcast")
+
     def __init__(self, node_id, pq):
-        self.node_id = node_id
-        self.pq = pq
-        self.neighbor_map = {}
-        self.links = set([])
+        super().__init__(node_id, pq)
+        self.stream = LegacyStream(random, JITTER)
 
         # State
-        self.on = False
         self.my_slot = False
-        self.latest_broadcast = None
         self.next_broadcast = None
-        self.timer_task = None
         
         # Logging related
-        self.log = []
-        self.log.append((0, self.node_id, "init", "None"))
-
-
-    def set_links(self, node_list):
-        self.links = set(node_list)
+        if "init" in CONFIG_LOG_EVENTS:
+            self.log.append((0, self.node_id, "init", "None"))
 
 
     def start(self, aux):
@@ -46,34 +45,34 @@ class SoloNode(object):
         self.next_broadcast = self.now() + INTERVAL
 
 
-    def now(self):
-        return self.pq.current
-
-
     def close_slot(self):
         now = self.now()
         target_share = self.target_share()
         my_share = now - self.latest_broadcast
         deficit = (target_share - my_share) / target_share
-        self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if "deficit" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if self.observer is not None:
+            self.observer.deficit(self.node_id, now, deficit)
         self.my_slot = False
 
     
     def broadcast(self):
         now = self.now()
         degree = len(self.neighbor_map)
-        for neighbor in self.links:
-            task = (neighbor.recv_callback, (self.node_id, degree))
-            self.pq.add_task(task, now)
+        self.send((self.node_id, degree), CONFIG_FANOUT)
          
-        self.log.append((now, self.node_id, "broadcast", "None"))
+        if "broadcast" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "broadcast", "None"))
+        if self.observer is not None:
+            self.observer.broadcast(self.node_id, now)
         if self.my_slot:
             self.close_slot()
         self.my_slot = True
         self.latest_broadcast = now
 
 
-    def recv_callback(self, src, deg):
+    def recv_callback(self, slot, src, deg):
         if not self.on:
             return
 
@@ -81,7 +80,7 @@ class SoloNode(object):
             self.close_slot()
         
         now = self.now()
-        self.neighbor_map[src] = now % INTERVAL
+        self.neighbor_map[slot] = now % INTERVAL
         delay = self.adjust(deg)
         if delay > 0:
             self.next_broadcast = self.next_broadcast + delay
@@ -95,9 +94,12 @@ class SoloNode(object):
 
 
     def set_timer(self, interval):
-        self.timer_task = (self.timer_callback, (None,))
-        interval += random.randint(-JITTER, JITTER)
-        self.pq.add_task(self.timer_task, self.now() + interval)
+        interval += self.stream.jitter()
+        if self.timer is None:
+            self.timer = self.pq.schedule(self.timer_callback, (None,),
+                                          self.now() + interval)
+        else:
+            self.pq.reschedule(self.timer, self.now() + interval)
 
 
     def adjust(self, your_degree): 
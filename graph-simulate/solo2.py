@@ -1,13 +1,18 @@
 import random
+from node import Node, SortedNeighborMap
+from streams import LegacyStream
 from constants import INTERVAL
 
 CONFIG_PATH_VECTOR = True
 CONFIG_CLAMPING = True
+CONFIG_FANOUT = False
+LOG_EVENTS = ["init", "broadcast", "deficit", "reset"]
+CONFIG_LOG_EVENTS = frozenset(LOG_EVENTS)
 
 JITTER = 10
 ALPHA = 50
 
-class SoloNode(object):
+class SoloNode(Node):
     """ Solo Node behaves in the following manner.
         1. When it starts, it broadcasts a beacon and reschedules a broadcast
            for INTERVAL after.
@@ -19,32 +24,27 @@ class SoloNode(object):
            distance between the sender's offset and its offset. If the sender
            has a deficit, the node (the receiver) reschedules the pending
            broadcast with a delay between 0 and INTERVAL/2.
-        6. Path vector loop detection is implemented.
+        6. Path vector loop detection is implemented. A path vector is the
+           set of node ids on the path, as the bits of an int.
         7. Target broadcast time is limited by the successor's broadcast time.
+           The neighbor offsets are kept in order on the circle, so that the
+           successor is found without scanning them.
     """
+    __slots__ = ("my_slot", "next_broadcast", "path_vector")
+    Map = SortedNeighborMap
+
     def __init__(self, node_id, pq):
-        self.node_id = node_id
-        self.pq = pq
-        self.neighbor_map = {}
-        self.links = set([])
+        super().__init__(node_id, pq)
+        self.stream = LegacyStream(random.Random(node_id), JITTER)
 
         # State
-        self.on = False
         self.my_slot = False
-        self.latest_broadcast = None
         self.next_broadcast = None
-        self.timer_task = None
-        self.path_vector = []
+        self.path_vector = 0
         
         # Logging related
-        self.log = []
-        self.log.append((0, self.node_id, "init", "None"))
-
-        self.random = random.Random(node_id)
-
-
-    def set_links(self, node_list):
-        self.links = set(node_list)
+        if "init" in CONFIG_LOG_EVENTS:
+            self.log.append((0, self.node_id, "init", "None"))
 
 
     def start(self, aux):
@@ -54,36 +54,35 @@ class SoloNode(object):
         self.next_broadcast = self.now() + INTERVAL
 
 
-    def now(self):
-        return self.pq.current
-
-
     def close_slot(self):
         now = self.now()
         target_share = self.target_share()
         my_share = now - self.latest_broadcast
         deficit = (target_share - my_share) / target_share
-        self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if "deficit" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "deficit", str(deficit)))
+        if self.observer is not None:
+            self.observer.deficit(self.node_id, now, deficit)
         self.my_slot = False
 
     
     def broadcast(self):
         now = self.now()
         degree = len(self.neighbor_map)
-        pv_string = self.pathvector_to_string(self.path_vector)
-        for neighbor in self.links:
-            task = (neighbor.recv_callback, (self.node_id, degree, pv_string))
-            self.pq.add_task(task, now)
+        self.send((self.node_id, degree, self.path_vector), CONFIG_FANOUT)
 
-        self.path_vector = [] 
-        self.log.append((now, self.node_id, "broadcast", "None"))
+        self.path_vector = 0
+        if "broadcast" in CONFIG_LOG_EVENTS:
+            self.log.append((now, self.node_id, "broadcast", "None"))
+        if self.observer is not None:
+            self.observer.broadcast(self.node_id, now)
         if self.my_slot:
             self.close_slot()
         self.my_slot = True
         self.latest_broadcast = now
 
 
-    def recv_callback(self, src, deg, pv_str):
+    def recv_callback(self, slot, src, deg, src_pv):
         if not self.on:
             return
 
@@ -91,8 +90,7 @@ class SoloNode(object):
             self.close_slot()
         
         now = self.now()
-        self.neighbor_map[src] = now
-        src_pv = self.string_to_pathvector(pv_str)
+        self.neighbor_map[slot] = now
         self.adjust(src, deg, src_pv)
 
 
@@ -103,9 +101,12 @@ class SoloNode(object):
 
 
     def set_timer(self, interval):
-        self.timer_task = (self.timer_callback, (None,))
-        interval += self.random.randint(-JITTER, JITTER)
-        self.pq.add_task(self.timer_task, self.now() + interval)
+        interval += self.stream.jitter()
+        if self.timer is None:
+            self.timer = self.pq.schedule(self.timer_callback, (None,),
+                                          self.now() + interval)
+        else:
+            self.pq.reschedule(self.timer, self.now() + interval)
 
 
     def adjust(self, your_id, your_degree, your_pv): 
@@ -118,16 +119,17 @@ class SoloNode(object):
             return
 
         if CONFIG_PATH_VECTOR:
-            if len(your_pv) > 0 and self.node_id in your_pv:
-                self.path_vector = []
-                self.log.append((now, self.node_id, "reset", "None"))
+            if your_pv >> self.node_id & 1:
+                self.path_vector = 0
+                if "reset" in CONFIG_LOG_EVENTS:
+                    self.log.append((now, self.node_id, "reset", "None"))
                 self.on = False
-                self.pq.remove_task(self.timer_task)
-                reset_time = now + self.random.randint(0, INTERVAL - 1)
+                self.pq.cancel(self.timer)
+                reset_time = now + self.stream.offset()
                 self.pq.add_task((self.start, (None,)), reset_time)
                 return
             else:
-                self.path_vector = your_pv + [your_id]
+                self.path_vector = your_pv | 1 << your_id
 
         target_bc = now + target_share
 
@@ -146,24 +148,10 @@ class SoloNode(object):
         return INTERVAL // (len(self.neighbor_map) + 1)
 
 
-    def pathvector_to_string(self, path_vector):
-        if len(path_vector) == 0:
-            return ""
-        else:
-            return ",".join(str(i) for i in path_vector)
-
-
-    def string_to_pathvector(self, string):
-        path_vector = []
-        if string != "":
-            path_vector = [int(s) for s in string.split(",")]
-        return path_vector
-
-
     def get_successor_expiry(self):
-        offsets = [t % INTERVAL for t in self.neighbor_map.values()]
-        distance = [self.diff(o, self.next_broadcast) for o in offsets]
-        return self.next_broadcast + min(distance) 
+        successor = self.neighbor_map.successor(
+                        self.next_broadcast % INTERVAL)
+        return self.next_broadcast + self.diff(successor, self.next_broadcast)
          
 
     def diff(self, a, b):
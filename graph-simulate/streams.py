@@ -0,0 +1,131 @@
+import collections
+import numpy as np
+from constants import INTERVAL
+
+JITTER_BLOCK_SIZE = 64
+OFFSET_BLOCK_SIZE = 8
+GROUP_SIZE = 64
+JITTER_STREAM = 0
+OFFSET_STREAM = 1
+RNG_MODES = ["node", "legacy"]
+
+"""
+A stream holds the random numbers a node draws: jitter() for the jitter
+added to each timer and offset() for the initial offset and the offsets of
+resets.
+
+NodeStream gives every node streams of its own, so the numbers of a node do
+not depend on the order in which nodes draw them. Nodes are grouped by
+GROUP_SIZE consecutive ids, and each group of a seed reads one generator
+per stream, seeded with (seed, stream, group), which draws a block for
+every node of the group at once. SeedStreams holds the groups of a seed.
+The lockstep engines read the same generators in the same blocks.
+LegacyStream draws from the global RNG, or from the RNG of the node for
+solo2, as the simulator always did, and reproduces its logs.
+"""
+
+
+class GroupDraws(object):
+    """ GroupDraws draws integers in [low, high] for a group of nodes from
+        one generator, as GROUP_SIZE x block_size arrays whose row k is the
+        next block of the k-th node of the group.
+        1. users is the number of nodes of the group that read blocks. A
+           block is kept until each of them has read it.
+        2. block(k, n) returns the n-th block of the k-th node.
+    """
+    __slots__ = ("generator", "low", "high", "block_size", "users",
+                 "blocks", "reads", "first")
+
+    def __init__(self, entropy, low, high, block_size, users):
+        self.generator = np.random.default_rng(entropy)
+        self.low = low
+        self.high = high
+        self.block_size = block_size
+        self.users = users
+        self.blocks = []
+        self.reads = []
+        self.first = 0
+
+    def block(self, k, n):
+        while self.first + len(self.blocks) <= n:
+            self.blocks.append(self.generator.integers(
+                                   self.low, self.high,
+                                   size=(GROUP_SIZE, self.block_size),
+                                   endpoint=True))
+            self.reads.append(0)
+        index = n - self.first
+        block = self.blocks[index][k]
+        self.reads[index] += 1
+        while self.reads and self.reads[0] == self.users:
+            del self.blocks[0], self.reads[0]
+            self.first += 1
+        return block
+
+
+class Draws(object):
+    """ Draws reads the integers of the k-th node of a GroupDraws, one
+        block at a time into a list that is consumed from the end.
+    """
+    __slots__ = ("group", "k", "count", "block")
+
+    def __init__(self, group, k):
+        self.group = group
+        self.k = k
+        self.count = 0
+        self.block = []
+
+    def __call__(self):
+        if not self.block:
+            self.block = self.group.block(self.k, self.count)[::-1].tolist()
+            self.count += 1
+        return self.block.pop()
+
+
+class SeedStreams(object):
+    """ SeedStreams holds the generators of a seed for the nodes that draw
+        from them, draws jitter in [-jitter, jitter] and offsets in
+        [0, INTERVAL), and gives each node its NodeStream.
+    """
+    __slots__ = ("groups",)
+
+    def __init__(self, seed, nodes, jitter):
+        users = collections.Counter(node // GROUP_SIZE for node in nodes)
+        self.groups = {}
+        for group, count in users.items():
+            self.groups[group] = (
+                GroupDraws([seed, JITTER_STREAM, group], -jitter, jitter,
+                           JITTER_BLOCK_SIZE, count),
+                GroupDraws([seed, OFFSET_STREAM, group], 0, INTERVAL - 1,
+                           OFFSET_BLOCK_SIZE, count))
+
+    def stream(self, node_id):
+        jitter, offset = self.groups[node_id // GROUP_SIZE]
+        return NodeStream(jitter, offset, node_id % GROUP_SIZE)
+
+
+class NodeStream(object):
+    """ NodeStream draws the jitter and offsets of the k-th node of the
+        groups jitter and offset.
+    """
+    __slots__ = ("jitter", "offset")
+
+    def __init__(self, jitter, offset, k):
+        self.jitter = Draws(jitter, k)
+        self.offset = Draws(offset, k)
+
+
+class LegacyStream(object):
+    """ LegacyStream draws jitter and offsets from rng, which is the random
+        module or a random.Random.
+    """
+    __slots__ = ("rng", "bound")
+
+    def __init__(self, rng, jitter):
+        self.rng = rng
+        self.bound = jitter
+
+    def jitter(self):
+        return self.rng.randint(-self.bound, self.bound)
+
+    def offset(self):
+        return self.rng.randint(0, INTERVAL - 1)
@@ -1,20 +1,42 @@
+import os
+import random
+import tempfile
 import unittest
 import unittest.mock
 
+import networkx as nx
+import numpy as np
+
+import analyze
+import analyze2
+import graph as graphutils
+import graphstore
+import lockstep
+import main
+import monitor
+import node
+import parallel
+import pdes
+import pqueue
 import sleepwell
+import solo2
+import streams
 from constants import *
 
 
 class TestSleepWell(unittest.TestCase):
     def setUp(self):
         self.node = sleepwell.SleepWellNode(0, None)
-        self.node.neighbor_map = {1: INTERVAL//10, 2: INTERVAL//4,
-                                  3: INTERVAL//2}
+        self.node.set_links([], [1, 2, 3], [0, 0, 0])
+        for slot, offset in enumerate([INTERVAL//10, INTERVAL//4,
+                                       INTERVAL//2]):
+            self.node.neighbor_map[slot] = offset
     
     def test_largest_gap(self):
-        start, end = self.node.largest_gap()
-        self.assertEqual(start, self.node.neighbor_map[3]) 
-        self.assertEqual(end, self.node.neighbor_map[1])
+        offsets = self.node.neighbor_map.values()
+        start, end = self.node.largest_gap(offsets)
+        self.assertEqual(start, self.node.neighbor_map[2]) 
+        self.assertEqual(end, self.node.neighbor_map[0])
 
 
     def test_target_share(self):
@@ -26,3 +48,601 @@ class TestSleepWell(unittest.TestCase):
             mock_now.return_value = 10 * INTERVAL + INTERVAL * 3 // 10
             interval = self.node.adjust()
             self.assertEqual(interval, INTERVAL + INTERVAL // 2)
+
+    def test_same_as_scan(self):
+        def largest_gap(offsets):
+            starts = sorted(offsets)
+            ends = starts[1:] + [starts[0]]
+            gaps = [self.node.diff(e, s) for s, e in zip(starts, ends)]
+            index = max(range(len(gaps)), key=gaps.__getitem__)
+            return starts[index], ends[index]
+
+        rng = random.Random(0)
+        for _ in range(500):
+            size = rng.randint(1, 12)
+            self.node.set_links([], range(size), [0] * size)
+            for slot in range(size):
+                if rng.random() < 0.8:
+                    self.node.neighbor_map[slot] = rng.choice(
+                        [0, INTERVAL // 2, rng.randrange(INTERVAL)])
+            offsets = [o for o in self.node.neighbor_map.offsets if o >= 0]
+            if not offsets:
+                continue
+            self.assertEqual(
+                self.node.largest_gap(self.node.neighbor_map.values()),
+                largest_gap(offsets))
+
+            now = rng.randrange(INTERVAL)
+            target_share = self.node.target_share()
+            my_share = min(self.node.diff(o, now) for o in offsets)
+            start, end = largest_gap(offsets)
+            half_gap = self.node.diff(end, start) // 2
+            if half_gap > target_share:
+                new_offset = self.node.sum(start, half_gap)
+            else:
+                new_offset = self.node.diff(end, target_share)
+            interval = self.node.diff(new_offset, now)
+            if interval <= INTERVAL // 2:
+                interval += INTERVAL
+            if my_share - target_share > -1e-3 * INTERVAL:
+                interval = INTERVAL
+
+            self.node.deficit_count = 0
+            with unittest.mock.patch("sleepwell.SleepWellNode.now") as \
+                    mock_now:
+                mock_now.return_value = now
+                self.assertEqual(self.node.adjust(), interval)
+
+
+class TestSolo2(unittest.TestCase):
+    def test_successor_same_as_scan(self):
+        node = solo2.SoloNode(0, None)
+        rng = random.Random(0)
+        for _ in range(200):
+            size = rng.randint(1, 12)
+            node.set_links([], range(size), [0] * size)
+            times = {}
+            for _ in range(3 * size):
+                slot = rng.randrange(size)
+                times[slot] = rng.randrange(10 * INTERVAL)
+                node.neighbor_map[slot] = times[slot]
+                node.next_broadcast = rng.choice(
+                    [rng.randrange(10 * INTERVAL), times[slot]])
+
+                offsets = [t % INTERVAL for t in times.values()]
+                distance = [node.diff(o, node.next_broadcast)
+                                for o in offsets]
+                self.assertEqual(node.get_successor_expiry(),
+                                 node.next_broadcast + min(distance))
+                self.assertEqual(node.target_share(),
+                                 INTERVAL // (len(times) + 1))
+
+
+    def test_path_vector_loop(self):
+        main.configure({"type": "solo2", "alpha": 50}, main.DEFAULT_OPTIONS)
+        queue = pqueue.PriorityQueue()
+        node_list = [solo2.SoloNode(i, queue) for i in range(6)]
+        node.connect(node_list, nx.complete_graph(6))
+        solo_node = node_list[5]
+        solo_node.start(None)
+        queue.current = INTERVAL * 9 // 10
+        solo_node.neighbor_map[1] = queue.current
+        solo_node.adjust(2, 1, 1 << 1 | 1 << 3)
+        self.assertEqual(solo_node.path_vector, 1 << 1 | 1 << 2 | 1 << 3)
+
+        solo_node.adjust(3, 1, 1 << 1 | 1 << 5)
+        self.assertFalse(solo_node.on)
+        self.assertEqual(solo_node.path_vector, 0)
+        self.assertEqual(solo_node.log[-1][2], "reset")
+
+
+class TestNode(unittest.TestCase):
+    def test_connect(self):
+        graph = nx.random_geometric_graph(30, 0.3, seed=5)
+        node_list = [sleepwell.SleepWellNode(i, None) for i in range(30)]
+        node.connect(node_list, graph)
+        for i, n in enumerate(node_list):
+            self.assertEqual(list(n.links), list(graph.neighbors(i)))
+            for j, slot in zip(n.links, n.slots):
+                self.assertEqual(node_list[j].links[slot], i)
+
+    def test_fanout(self):
+        graph = nx.random_geometric_graph(120, 0.15, seed=2)
+        for algorithm in [{"type": "sleepwell"},
+                          {"type": "solo", "alpha": 50},
+                          {"type": "solo2", "alpha": 87},
+                          {"type": "desync", "alpha": 87}]:
+            logs = []
+            for fanout in [False, True]:
+                options = main.make_options(fanout=fanout,
+                                            duration=20 * INTERVAL)
+                result = main.simulate(graph, 1, algorithm, options)
+                logs.append(sorted(sum(result["logs"], [])))
+            self.assertEqual(logs[0], logs[1])
+
+    def test_neighbor_map(self):
+        neighbor_map = node.NeighborMap(3)
+        neighbor_map[2] = INTERVAL // 2
+        neighbor_map[0] = 0
+        neighbor_map[2] = INTERVAL // 4
+        self.assertEqual(len(neighbor_map), 2)
+        self.assertEqual(neighbor_map.values(), [0, INTERVAL // 4])
+
+
+class TestCalendarQueue(unittest.TestCase):
+    def test_same_order_as_heap(self):
+        heap = pqueue.PriorityQueue()
+        calendar = pqueue.CalendarQueue()
+        for i in range(200):
+            task = ("task", i % 50)
+            heap.add_task(task, (i * 7) % 13)
+            calendar.add_task(task, (i * 7) % 13)
+        heap.remove_task(("task", 3))
+        calendar.remove_task(("task", 3))
+
+        popped = [(heap.pop_task(), heap.current) for _ in range(49)]
+        self.assertEqual(popped, [(calendar.pop_task(), calendar.current)
+                                    for _ in range(49)])
+        self.assertRaises(KeyError, calendar.pop_task)
+
+
+class TestCompaction(unittest.TestCase):
+    def fill(self, queue):
+        for i in range(300):
+            queue.add_task(("task", i % 100), (i * 7) % 13)
+        return queue
+
+    def test_accounting(self):
+        for Queue in [pqueue.PriorityQueue, pqueue.CalendarQueue]:
+            queue = self.fill(Queue(compact_ratio=1.0))
+            self.assertEqual(len(queue), 100)
+            self.assertEqual(queue.dead, 200)
+            self.assertEqual(queue.peak, 300)
+            queue.compact()
+            self.assertEqual(queue.dead, 0)
+            self.assertEqual(len(queue), 100)
+
+    def test_same_order(self):
+        for Queue in [pqueue.PriorityQueue, pqueue.CalendarQueue]:
+            lazy = self.fill(Queue(compact_ratio=1.0))
+            eager = self.fill(Queue(compact_ratio=0.1))
+            self.assertGreater(eager.compactions, 0)
+            self.assertEqual([lazy.pop_task() for _ in range(100)],
+                             [eager.pop_task() for _ in range(100)])
+
+
+class TestTimer(unittest.TestCase):
+    def test_reschedule(self):
+        for Queue in [pqueue.PriorityQueue, pqueue.CalendarQueue]:
+            queue = Queue()
+            early = queue.schedule("early", (), 10)
+            late = queue.schedule("late", (), 20)
+            queue.add_task(("task", 0), 30)
+            queue.reschedule(early, 30)
+            queue.reschedule(late, 5)
+            self.assertEqual(len(queue), 3)
+            self.assertEqual(queue.pop_task(), ("late", ()))
+            self.assertEqual(queue.pop_task(), ("task", 0))
+            self.assertEqual(queue.pop_task(), ("early", ()))
+            self.assertEqual(queue.current, 30)
+            self.assertFalse(early.pending())
+
+    def test_cancel(self):
+        for Queue in [pqueue.PriorityQueue, pqueue.CalendarQueue]:
+            queue = Queue()
+            timer = queue.schedule("timer", (), 10)
+            queue.cancel(timer)
+            self.assertEqual(len(queue), 0)
+            self.assertRaises(KeyError, queue.cancel, timer)
+            queue.reschedule(timer, 15)
+            self.assertEqual(queue.pop_task(), ("timer", ()))
+
+    def test_peek(self):
+        for Queue in [pqueue.PriorityQueue, pqueue.CalendarQueue]:
+            queue = Queue()
+            early = queue.schedule("early", (), 10)
+            queue.add_task(("task", 0), 20)
+            queue.add_task(("task", 1), 5)
+            queue.remove_task(("task", 1))
+            queue.reschedule(early, 30)
+            popped = []
+            while queue.peek() is not None:
+                priority = queue.peek()
+                popped.append(queue.pop_task())
+                self.assertEqual(queue.current, priority)
+            self.assertEqual(popped, [("task", 0), ("early", ())])
+
+
+class TestConvergenceMonitor(unittest.TestCase):
+    def test_stable(self):
+        watch = monitor.ConvergenceMonitor(2, 2)
+        for time in [5, 5 + INTERVAL + 1000, 5 + 2 * INTERVAL + 1000]:
+            watch.broadcast(0, time)
+        for time in [7, 7 + INTERVAL, 7 + 2 * INTERVAL]:
+            watch.broadcast(1, time)
+        self.assertFalse(watch.stable)
+        watch.broadcast(0, 5 + 3 * INTERVAL + 1000)
+        self.assertTrue(watch.stable)
+        self.assertEqual(watch.summary(0)["converge"], 5 + INTERVAL + 1000)
+        watch.broadcast(1, 7 + 4 * INTERVAL)
+        self.assertFalse(watch.stable)
+
+    def test_cycle(self):
+        watch = monitor.ConvergenceMonitor(2, detect_cycles=True)
+        for k in range(5):
+            watch.broadcast(0, k * INTERVAL + 10)
+            watch.broadcast(1, k * INTERVAL + (3 + 3 * (k % 2)) * INTERVAL // 10)
+            self.assertIsNone(watch.cycle)
+        watch.broadcast(0, 5 * INTERVAL + 10)
+        self.assertEqual(watch.cycle, 2)
+        self.assertEqual(watch.summary(0), {"cycle": 2})
+
+    def test_reset_loop(self):
+        watch = monitor.ConvergenceMonitor(1, detect_cycles=True)
+        watch.reset(0, 5 * INTERVAL)
+        self.assertFalse(watch.done)
+        watch.reset(0, 205 * INTERVAL)
+        self.assertEqual(watch.cycle, 200)
+
+    def test_early_stop(self):
+        graph = nx.complete_graph(6)
+        algorithm = {"type": "sleepwell"}
+        full = main.simulate(graph, 0, algorithm)
+        early = main.simulate(graph, 0, algorithm,
+                              main.make_options(early_stop=5))
+        self.assertLess(early["events"], full["events"] / 2)
+
+        log = sum([node.log for node in full["nodes"]], [])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = os.path.join(tmpdir, "log.txt")
+            with unittest.mock.patch("builtins.print"):
+                main.write_log(log, log_file)
+            converge_time = analyze.examine_converge_time(log_file)
+        self.assertEqual(early["summary"]["converge"], converge_time)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_summary_matches_log(self):
+        graph = nx.random_geometric_graph(15, 0.4, seed=1)
+        algorithm = {"type": "sleepwell"}
+        examine = [analyze.examine_converge_time,
+                   analyze.examine_final_offsets,
+                   analyze.examine_min_broadcast_count,
+                   analyze.examine_last_deficit]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "graph.txt")
+            nx.write_adjlist(graph, graph_file)
+            results = []
+            for name, options in [("full", main.DEFAULT_OPTIONS),
+                                  ("summary", main.make_options(
+                                                summary=True, log_events=[]))]:
+                log_file = os.path.join(tmpdir, name + ".txt")
+                with unittest.mock.patch("builtins.print"):
+                    main.test_instance(graph_file, 0, algorithm, log_file,
+                                       options)
+                results.append([f(log_file) for f in examine] +
+                               [analyze2.examine_target_separation(graph_file,
+                                                                   log_file)])
+        self.assertEqual(results[0], results[1])
+
+    def test_log_events(self):
+        graph = nx.complete_graph(4)
+        algorithm = {"type": "sleepwell"}
+        options = main.make_options(log_events=["reset"])
+        result = main.simulate(graph, 0, algorithm, options)
+        kinds = {entry[2] for node in result["nodes"] for entry in node.log}
+        self.assertEqual(kinds, {"init"})
+
+        result = main.simulate(graph, 0, algorithm,
+                               main.make_options(log_events=[]))
+        self.assertEqual(sum(len(node.log) for node in result["nodes"]), 0)
+
+    def test_binary_matches_text(self):
+        graph = nx.random_geometric_graph(15, 0.4, seed=2)
+        algorithm = {"type": "sleepwell"}
+        examine = [analyze.examine_converge_time,
+                   analyze.examine_final_offsets,
+                   analyze.examine_min_broadcast_count,
+                   analyze.examine_last_deficit]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "graph.txt")
+            nx.write_adjlist(graph, graph_file)
+            results = []
+            for log_format in ["text", "binary"]:
+                log_file = os.path.join(tmpdir, log_format)
+                options = main.make_options(log_format=log_format)
+                with unittest.mock.patch("builtins.print"):
+                    main.test_instance(graph_file, 0, algorithm, log_file,
+                                       options)
+                results.append([f(log_file) for f in examine])
+        self.assertEqual(results[0], results[1])
+
+
+class TestSeedChunks(unittest.TestCase):
+    def test_chunks(self):
+        seed_list = list(range(10))
+        self.assertEqual(sum(main.seed_chunks(seed_list, 3), []), seed_list)
+        self.assertEqual(main.auto_seed_chunk(1, 1000, 8), 32)
+        self.assertEqual(main.auto_seed_chunk(100, 1000, 8),
+                         main.MAX_SEED_CHUNK)
+        self.assertEqual(main.auto_seed_chunk(100, 1, 8), 1)
+
+    def test_graph_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "0.txt")
+            nx.write_adjlist(nx.path_graph(4), graph_file)
+            graph = graphutils.load_graph(graph_file)
+            self.assertIs(graphutils.load_graph(graph_file), graph)
+            self.assertEqual(sorted(graph.edges()), [(0, 1), (1, 2), (2, 3)])
+
+
+class TestParallel(unittest.TestCase):
+    def test_longest_first(self):
+        self.assertEqual(list(parallel.stream(abs, [1, -3, 2], 1, cost=abs)),
+                         [(1, 3), (2, 2), (0, 1)])
+
+    def test_run_in_order(self):
+        jobs = [-j for j in range(20)]
+        for workers in [1, 3]:
+            self.assertEqual(parallel.run(abs, jobs, workers, 2, cost=abs),
+                             list(range(20)))
+
+
+class TestComponents(unittest.TestCase):
+    @unittest.mock.patch("main.COMPONENT_PARALLEL_SIZE", 5)
+    def test_same_as_whole_graph(self):
+        graph = nx.disjoint_union_all([nx.complete_graph(6),
+                                       nx.path_graph(5),
+                                       nx.star_graph(4), nx.empty_graph(2)])
+        options = main.make_options(summary=True, duration=20 * INTERVAL,
+                                    workers=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "0.txt")
+            nx.write_adjlist(graph, graph_file)
+            graph = graphutils.load_graph(graph_file)
+            for algorithm in [{"type": "sleepwell"},
+                              {"type": "solo2", "alpha": 87}]:
+                whole = main.simulate(graph, 3, algorithm, options)
+                split = main.simulate_components(graph_file, 3, algorithm,
+                                                 options)
+                self.assertEqual(sorted(sum(split["logs"], [])),
+                                 sorted(sum(whole["logs"], [])))
+                self.assertEqual(split["summary"], whole["summary"])
+                self.assertEqual(split["time"], whole["time"])
+
+
+class TestPdes(unittest.TestCase):
+    def test_same_as_sequential(self):
+        graph = nx.random_geometric_graph(80, 0.2, seed=3)
+        algorithm = {"type": "sleepwell"}
+        options = main.make_options(duration=10 * INTERVAL)
+        main.configure(algorithm, options)
+        whole = main.simulate(graph, 4, algorithm, options)
+        for num_parts in [1, 3]:
+            split = main.merge_held(pdes.simulate(graph, 4, options,
+                                                  num_parts), options)
+            self.assertEqual(sorted(sum(split["logs"], [])),
+                             sorted(sum(whole["logs"], [])))
+            self.assertEqual(split["events"], whole["events"])
+
+    def test_fanout(self):
+        graph = nx.random_geometric_graph(20, 0.4, seed=3)
+        options = main.make_options(fanout=True)
+        self.assertRaises(ValueError, pdes.simulate, graph, 0, options, 2)
+
+    def test_inline_and_failure(self):
+        graph = nx.random_geometric_graph(40, 0.3, seed=5)
+        algorithm = {"type": "sleepwell"}
+        options = main.make_options(duration=5 * INTERVAL)
+        main.configure(algorithm, options)
+        whole = main.simulate(graph, 1, algorithm, options)
+        with unittest.mock.patch("multiprocessing.current_process") as cur:
+            cur.return_value.daemon = True
+            split = main.merge_held(pdes.simulate(graph, 1, options, 3),
+                                    options)
+        self.assertEqual(sorted(sum(split["logs"], [])),
+                         sorted(sum(whole["logs"], [])))
+        self.assertEqual(split["events"], whole["events"])
+
+        def fail(part, end):
+            raise ValueError(part.index)
+        with unittest.mock.patch("pdes.Partition.run", fail):
+            self.assertRaises(RuntimeError, pdes.simulate, graph, 1, options,
+                              2)
+
+
+class TestGraphStore(unittest.TestCase):
+    def test_shared_graphs(self):
+        graphs = [nx.gnp_random_graph(30, 0.1, seed=1),
+                  nx.disjoint_union(nx.path_graph(3), nx.empty_graph(2))]
+        coords = [[[i, -i] for i in range(30)], None]
+        with graphstore.GraphStore(graphs, coords) as store:
+            name = store.memory.name
+            for graph, handle in zip(graphs, store.handles):
+                shared = graphstore.attach(handle)
+                self.assertEqual([shared.neighbors(i) for i in shared],
+                                 [list(graph.neighbors(i)) for i in graph])
+            shared = graphstore.attach(store.handles[0])
+            self.assertEqual(shared.coords[4].tolist(), [4, -4])
+            self.assertEqual(
+                graphstore.connected_components(
+                    graphstore.attach(store.handles[1])),
+                [[0, 1, 2], [3], [4]])
+            del shared
+        self.assertRaises(FileNotFoundError,
+                          graphstore.shared_memory.SharedMemory, name)
+
+    def test_sweep(self):
+        algorithm = {"type": "sleepwell"}
+        options = main.make_options(duration=10 * INTERVAL, workers=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for graph_id in range(2):
+                nx.write_adjlist(nx.random_geometric_graph(15, 0.4,
+                                                           seed=graph_id),
+                                 os.path.join(tmpdir, "%d.txt" % graph_id))
+            with open(os.path.join(tmpdir, "index.txt"), "w") as fo:
+                fo.write("0\n1\n")
+            outdir = os.path.join(tmpdir, "logs")
+            os.mkdir(outdir)
+            with unittest.mock.patch("builtins.print"):
+                main.test_multiple_graphs(tmpdir, [0, 1], algorithm, outdir,
+                                          options)
+                main.test_instance(os.path.join(tmpdir, "1.txt"), 1,
+                                   algorithm, os.path.join(tmpdir, "1-1"),
+                                   options)
+            with open(os.path.join(outdir, "graph-1-seed-1.txt")) as fo:
+                shared = fo.read()
+            with open(os.path.join(tmpdir, "1-1")) as fo:
+                self.assertEqual(fo.read(), shared)
+
+
+class TestBoundedLogging(unittest.TestCase):
+    def test_flush_matches_full(self):
+        graph = nx.random_geometric_graph(15, 0.4, seed=3)
+        algorithm = {"type": "sleepwell"}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "graph.txt")
+            nx.write_adjlist(graph, graph_file)
+            contents = []
+            for name, flush_interval in [("full", 0), ("flushed", 3)]:
+                log_file = os.path.join(tmpdir, name + ".txt")
+                options = main.make_options(duration=10 * INTERVAL,
+                                            flush_interval=flush_interval)
+                with unittest.mock.patch("builtins.print"):
+                    main.test_instance(graph_file, 0, algorithm, log_file,
+                                       options)
+                with open(log_file) as fo:
+                    contents.append(fo.read())
+        self.assertEqual(contents[0], contents[1])
+
+    def test_log_tail(self):
+        graph = nx.complete_graph(4)
+        algorithm = {"type": "sleepwell"}
+        full = main.simulate(graph, 0, algorithm,
+                             main.make_options(duration=10 * INTERVAL))
+        tail = main.simulate(graph, 0, algorithm,
+                             main.make_options(duration=10 * INTERVAL,
+                                               log_tail=5))
+        for node, tail_node in zip(full["nodes"], tail["nodes"]):
+            self.assertEqual(list(tail_node.log), node.log[-5:])
+        self.assertEqual(len(tail["preamble"]), len(graph))
+
+
+    def test_run_length_matches_full(self):
+        graph = nx.random_geometric_graph(15, 0.4, seed=4)
+        algorithm = {"type": "sleepwell"}
+        examine = [analyze.examine_converge_time,
+                   analyze.examine_final_offsets,
+                   analyze.examine_min_broadcast_count]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            graph_file = os.path.join(tmpdir, "graph.txt")
+            nx.write_adjlist(graph, graph_file)
+            for log_format in ["text", "binary"]:
+                results = []
+                for run_length in [False, True]:
+                    log_file = os.path.join(tmpdir, "%s-%s" % (log_format,
+                                                               run_length))
+                    options = main.make_options(log_format=log_format,
+                                                run_length=run_length,
+                                                flush_interval=7)
+                    with unittest.mock.patch("builtins.print"):
+                        main.test_instance(graph_file, 0, algorithm,
+                                           log_file, options)
+                    results.append([f(log_file) for f in examine])
+                self.assertEqual(results[0], results[1])
+            self.assertLess(os.path.getsize(log_file),
+                            os.path.getsize(os.path.join(tmpdir,
+                                                         "binary-False")))
+
+
+class TestLockstep(unittest.TestCase):
+    def assert_same_logs(self, graph, algorithm, seed_list):
+        logs = lockstep.simulate(graph, seed_list, algorithm)
+        for seed, log in zip(seed_list, logs):
+            result = main.simulate(graph, seed, algorithm)
+            expected = sorted(sum([n.log for n in result["nodes"]], []))
+            self.assertEqual(sorted(log), expected)
+
+    @unittest.mock.patch("sleepwell.JITTER", 0)
+    def test_sleepwell(self):
+        algorithm = {"type": "sleepwell"}
+        for graph in [nx.complete_graph(6), nx.path_graph(5),
+                      nx.star_graph(4)]:
+            self.assert_same_logs(graph, algorithm, [0, 1, 2])
+
+    @unittest.mock.patch("solo.JITTER", 0)
+    @unittest.mock.patch("solo2.JITTER", 0)
+    def test_solo(self):
+        for algorithm in [{"type": "solo", "alpha": 50},
+                          {"type": "solo2", "alpha": 87}]:
+            for graph in [nx.complete_graph(6), nx.path_graph(5),
+                          nx.star_graph(4)]:
+                self.assert_same_logs(graph, algorithm, [0, 1, 2])
+
+    def test_node_streams_with_jitter(self):
+        graph = nx.gnp_random_graph(12, 0.3, seed=1)
+        for algorithm in [{"type": "sleepwell"},
+                          {"type": "solo", "alpha": 50},
+                          {"type": "solo2", "alpha": 87}]:
+            self.assert_same_logs(graph, algorithm, [0, 1])
+
+    def test_random_stream_same_as_seed_streams(self):
+        num_nodes = streams.GROUP_SIZE + 6
+        seed_list = [3, 5]
+        _, jitter, offset = lockstep.random_streams(seed_list, num_nodes, 10,
+                                                    "node")
+        keys = [(s, i) for s in range(len(seed_list))
+                    for i in range(num_nodes)]
+        rng = random.Random(0)
+        for draws, name, count in [(jitter, "jitter", 200),
+                                   (offset, "offset", 30)]:
+            expected = {}
+            for s, seed in enumerate(seed_list):
+                seed_streams = streams.SeedStreams(seed, range(num_nodes), 10)
+                for i in range(num_nodes):
+                    stream = getattr(seed_streams.stream(i), name)
+                    expected[s, i] = [stream() for _ in range(count)]
+            drawn = {key: [] for key in keys}
+            if name == "offset":
+                for key in keys:
+                    drawn[key].append(expected[key][0])
+            while any(len(drawn[key]) < count for key in keys):
+                batch = [key for key in keys if len(drawn[key]) < count
+                             and rng.random() < 0.3]
+                batch += [key for key in batch
+                              if len(drawn[key]) + 1 < count
+                                 and rng.random() < 0.2]
+                values = draws.draw(np.array([s for s, _ in batch]),
+                                    np.array([i for _, i in batch]))
+                for key, value in zip(batch, values.tolist()):
+                    drawn[key].append(value)
+            self.assertEqual(drawn, expected)
+
+    def test_options_not_module_state(self):
+        graph = nx.complete_graph(4)
+        algorithm = {"type": "sleepwell"}
+        main.configure(algorithm, main.make_options(log_events=[]))
+        logs = lockstep.simulate(graph, [0], algorithm, 5 * INTERVAL)
+        self.assertEqual({entry[2] for entry in logs[0]},
+                         {"init", "broadcast", "deficit"})
+        options = main.make_options(log_events=["broadcast"])
+        logs = lockstep.simulate(graph, [0], algorithm, 5 * INTERVAL,
+                                 options=options)
+        self.assertEqual({entry[2] for entry in logs[0]},
+                         {"init", "broadcast"})
+
+    def test_desync(self):
+        graph = nx.complete_graph(5)
+        algorithm = {"type": "desync", "alpha": 87}
+        for log in lockstep.simulate(graph, [0, 1], algorithm):
+            self.assertEqual({entry[2] for entry in log},
+                             {"init", "broadcast", "adjust", "deficit"})
+            last = {}
+            for time, node, kind, _ in sorted(log):
+                if kind == "broadcast":
+                    last[node] = time % INTERVAL
+            offsets = sorted(last.values())
+            gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+            for gap in gaps:
+                self.assertAlmostEqual(gap / INTERVAL, 0.2,
+                                       places=3)